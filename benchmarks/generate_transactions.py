@@ -0,0 +1,107 @@
+"""Generate synthetic input files for the sources in source_schema_mapping.json.
+
+Vendors follow a Zipf-like distribution over a pool of merchants, each with
+several card descriptor variants (store numbers), dates mix a main format with
+a few others, and every column has a configurable null rate.
+
+    python -m benchmarks.generate_transactions sourceB_example 1M data/input/bench.csv
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+SIZES = {"10k": 10_000, "1M": 1_000_000, "10M": 10_000_000}
+
+MERCHANTS = [
+    "SQ *COFFEE", "SHELL OIL", "TRADER JOES", "AMAZON MKTP", "UBER TRIP", "NETFLIX.COM",
+    "WHOLEFDS", "CHEVRON", "TST* RESTAURANT", "COMCAST", "CVS PHARMACY", "TARGET",
+]
+CITIES = ["SEATTLE", "PORTLAND", "SAN FRANCISCO", "DENVER", "AUSTIN"]
+DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%d-%m-%Y", "%Y.%m.%d"]
+CATEGORIES = ["Food & Drink", "Shopping", "Gas", "Groceries", "Travel", "Entertainment", "Utilities"]
+
+
+def vendor_pool(rng, vendors):
+    merchants = rng.choice(MERCHANTS, vendors)
+    store_numbers = rng.integers(1000, 9999, vendors)
+    cities = rng.choice(CITIES, vendors)
+    return np.array([f"{m} {n} {c}" for m, n, c in zip(merchants, store_numbers, cities)])
+
+
+def dates(rng, rows, main_format, mixed_rate):
+    days = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+    formats = np.where(rng.random(rows) < mixed_rate, rng.choice(DATE_FORMATS, rows), main_format)
+    result = np.empty(rows, dtype=object)
+    for fmt in np.unique(formats):
+        mask = formats == fmt
+        result[mask] = days[mask].strftime(str(fmt))
+    return result
+
+
+def with_nulls(rng, values, null_rate):
+    values = pd.Series(values, dtype=object)
+    return values.mask(rng.random(len(values)) < null_rate)
+
+
+# Build a synthetic input DataFrame with the given source's column names
+def generate_source_data(
+    source,
+    rows,
+    vendors=5_000,
+    null_rate=0.01,
+    mixed_date_rate=0.02,
+    seed=0,
+):
+    rng = np.random.default_rng(seed)
+    pool = vendor_pool(rng, vendors)
+    # Zipf-like popularity: a few vendors make up most of the rows
+    weights = 1 / np.arange(1, vendors + 1)
+    vendor = pool[rng.choice(vendors, rows, p=weights / weights.sum())]
+    amount = np.round(rng.lognormal(3, 1, rows), 2)
+    balance = np.round(5_000 - np.cumsum(amount) % 5_000, 2)
+
+    if source == "sourceA_example":
+        columns = {
+            "Transaction Date": dates(rng, rows, "%m/%d/%Y", mixed_date_rate),
+            "Transaction Description": vendor,
+            "Transaction Type": rng.choice(["Debit", "Credit"], rows, p=[0.9, 0.1]),
+            "Transaction Amount": amount,
+            "Balance": balance,
+        }
+    elif source == "sourceB_example":
+        columns = {
+            "Transaction Date": dates(rng, rows, "%m/%d/%Y", mixed_date_rate),
+            "Description": vendor,
+            "Category": rng.choice(CATEGORIES, rows),
+            "Amount": -amount,
+            "Balance": balance,
+            "Type": rng.choice(["Sale", "Payment", "Return"], rows, p=[0.9, 0.05, 0.05]),
+        }
+    elif source == "sourceC_example":
+        columns = {
+            "Date (MM-DD-YYYY)": dates(rng, rows, "%Y-%m-%d", mixed_date_rate),
+            "Store / Vendor": vendor,
+            "$ Amount": amount,
+            "Expense Category": rng.choice(CATEGORIES, rows),
+            "Notes (Optional)": rng.choice(["", "reimbursable", "split"], rows),
+        }
+    else:
+        raise ValueError(f"No generator for source: {source}")
+
+    return pd.DataFrame({name: with_nulls(rng, values, null_rate) for name, values in columns.items()})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", choices=["sourceA_example", "sourceB_example", "sourceC_example"])
+    parser.add_argument("size", choices=list(SIZES))
+    parser.add_argument("output_file")
+    parser.add_argument("--vendors", type=int, default=5_000)
+    parser.add_argument("--null-rate", type=float, default=0.01)
+    parser.add_argument("--mixed-date-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_source_data(
+        args.source, SIZES[args.size], args.vendors, args.null_rate, args.mixed_date_rate, args.seed
+    ).to_csv(args.output_file, index=False)
@@ -0,0 +1,140 @@
+"""End-to-end ETL benchmarks on synthetic input files.
+
+Each case generates an input file (see generate_transactions.py) and runs it
+through main.process_source_file with a RunProfiler, writing to temporary
+pending/final outputs. The best time over the repeats is reported for the
+whole run and for each profiled stage (read_csv, transform, writers), and
+compared against the stored baselines in baselines.json.
+
+    python -m benchmarks.run_benchmarks --sizes 10k 1M
+    python -m benchmarks.run_benchmarks --sizes 10k --save-baseline
+"""
+import argparse
+import contextlib
+import json
+import os
+import tempfile
+from .generate_transactions import SIZES, generate_source_data
+from src import main
+from src.config.config import CHUNK_SIZE
+from src.storage.rollups import SpendingRollups
+from src.storage.transaction_store import CsvTransactionStore
+from src.transformation.common_transformation import SourceToStandardTransformer
+from src.transformation.transform_sources import CheckingTransformer, CreditCardATransformer
+from src.ingestion.ingestion_manifest import IngestionManifest
+from src.utils.id_index import TransactionIdIndex
+from src.utils.logger import logger
+from src.utils.profiler import RunProfiler
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+TRANSFORMERS = {
+    "sourceA_example": CheckingTransformer,
+    "sourceB_example": CreditCardATransformer,
+    "sourceC_example": lambda **kwargs: SourceToStandardTransformer("sourceC_example", **kwargs),
+}
+
+STAGES = ["read_csv", "normalize_schema", "apply_transformation", "find_duplicates", "write_pending", "write_final"]
+
+# Slowdown against the baseline reported as a regression
+REGRESSION_THRESHOLD = 1.25
+
+
+# Run one input file through the full pipeline and return seconds per stage.
+# main's outputs point into work_dir for the run and are restored afterwards.
+def run_case(input_file, transformer_class, columnar, chunk_size, work_dir):
+    final_file = os.path.join(work_dir, "final.csv")
+    for file_name in ["final.csv", "pending.csv", "ids.sqlite", "manifest.json", "rollups.sqlite"]:
+        file_name = os.path.join(work_dir, file_name)
+        if os.path.exists(file_name):
+            os.remove(file_name)
+    outputs = ["final_store", "PENDING_FILE", "id_index", "manifest", "rollups"]
+    originals = {name: getattr(main, name) for name in outputs}
+    main.final_store = CsvTransactionStore(final_file)
+    main.PENDING_FILE = os.path.join(work_dir, "pending.csv")
+    main.id_index = TransactionIdIndex(os.path.join(work_dir, "ids.sqlite"), main.final_store)
+    main.manifest = IngestionManifest(os.path.join(work_dir, "manifest.json"))
+    main.rollups = SpendingRollups(os.path.join(work_dir, "rollups.sqlite"), main.final_store)
+
+    transformer = transformer_class(columnar=columnar)
+    profiler = RunProfiler(input_file, trace_memory=False)
+    try:
+        profiler.start()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            main.process_source_file(transformer, input_file, chunk_size, profiler)
+        profiler.stop()
+    finally:
+        main.id_index.close()
+        main.rollups.close()
+        for name, value in originals.items():
+            setattr(main, name, value)
+
+    timings = {"total": profiler.seconds}
+    for stage in profiler.report()["stages"]:
+        if stage["stage"] in STAGES:
+            timings[stage["stage"]] = stage["seconds"]
+    return timings
+
+
+def run_benchmarks(sources, sizes, modes, repeats, chunk_size, data_dir):
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for source in sources:
+            for size in sizes:
+                input_file = os.path.join(data_dir, f"{source}_{size}.csv")
+                if not os.path.exists(input_file):
+                    generate_source_data(source, SIZES[size]).to_csv(input_file, index=False)
+                for mode in modes:
+                    best = {}
+                    for _ in range(repeats):
+                        timings = run_case(
+                            input_file, TRANSFORMERS[source], mode == "columnar", chunk_size, work_dir
+                        )
+                        for stage, seconds in timings.items():
+                            best[stage] = min(seconds, best.get(stage, seconds))
+                    for stage, seconds in best.items():
+                        results[f"{source}/{size}/{mode}/{stage}"] = {
+                            "rows": SIZES[size],
+                            "seconds": seconds,
+                        }
+    return results
+
+
+def print_results(results, baselines):
+    print(f"{'benchmark':<58} {'seconds':>9} {'rows/s':>12} {'baseline':>9} {'ratio':>6}")
+    for name, result in results.items():
+        seconds = result["seconds"]
+        line = f"{name:<58} {seconds:>9.3f} {result['rows'] / seconds if seconds else 0:>12,.0f}"
+        if name in baselines:
+            ratio = seconds / baselines[name]["seconds"] if baselines[name]["seconds"] else 0
+            line += f" {baselines[name]['seconds']:>9.3f} {ratio:>6.2f}"
+            if ratio > REGRESSION_THRESHOLD:
+                line += "  REGRESSION"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sources", nargs="+", default=list(TRANSFORMERS), choices=list(TRANSFORMERS))
+    parser.add_argument("--sizes", nargs="+", default=["10k"], choices=list(SIZES))
+    parser.add_argument("--modes", nargs="+", default=["columnar"], choices=["columnar", "rows"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--data-dir", default=tempfile.gettempdir(), help="where generated inputs are cached")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    args = parser.parse_args()
+
+    logger.disabled = True
+    baselines = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as file:
+            baselines = json.load(file)
+
+    results = run_benchmarks(args.sources, args.sizes, args.modes, args.repeats, args.chunk_size, args.data_dir)
+    print_results(results, baselines)
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(BASELINE_FILE, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+        print(f"Saved baseline to {BASELINE_FILE}")
@@ -9,17 +9,65 @@ LOGS_DIR_NAME = "logs"
 CONFIG_DIR_NAME = "src/config"
 INPUT_DIR_NAME = "input"
 ARCHIVE_DIR_NAME = "archive"
+EXPORT_DIR_NAME = "export"
 
 DATA_DIR = os.path.join(BASE_DIR, DATA_DIR_NAME)
 PENDING_DIR = os.path.join(DATA_DIR, PENDING_DIR_NAME)
 FINAL_DIR = os.path.join(DATA_DIR, FINAL_DIR_NAME)
 INPUT_DIR = os.path.join(DATA_DIR, INPUT_DIR_NAME)
 ARCHIVE_DIR = os.path.join(DATA_DIR, ARCHIVE_DIR_NAME)
+EXPORT_DIR = os.path.join(DATA_DIR, EXPORT_DIR_NAME)
 CONFIG_DIR = os.path.join(BASE_DIR, CONFIG_DIR_NAME)
 LOGS_DIR = os.path.join(BASE_DIR, LOGS_DIR_NAME)
 
+PROFILE_DIR = os.path.join(LOGS_DIR, "profiles")
+LOG_FILE = os.path.join(LOGS_DIR, "app.log")
+
+# Log levels of the console and of LOG_FILE (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+LOG_LEVEL = "DEBUG"
+LOG_FILE_LEVEL = "INFO"
+
+# Sample values per rule and column in each chunk's rule failure summary (0 for counts only)
+ERROR_SAMPLES = 3
+
 CATEGORY_CONFIG_FILE = os.path.join(
     BASE_DIR, CONFIG_DIR_NAME, "categories.json"
 )
 PENDING_FILE = os.path.join(PENDING_DIR, "transactions_pending.csv")
+MANIFEST_FILE = os.path.join(DATA_DIR, "ingestion_manifest.json")
 FINAL_FILE = os.path.join(FINAL_DIR, "transactions_final.csv")
+ID_INDEX_FILE = os.path.join(FINAL_DIR, "transaction_ids.sqlite")
+FINAL_STORE_DIR = os.path.join(FINAL_DIR, "transactions")
+FINAL_DB_FILE = os.path.join(FINAL_DIR, "transactions_final.sqlite")
+ROLLUP_FILE = os.path.join(FINAL_DIR, "rollups.sqlite")
+SOURCE_SCHEMA_FILE = os.path.join(CONFIG_DIR, "source_schema_mapping.json")
+DESTINATION_SCHEMA_FILE = os.path.join(CONFIG_DIR, "destination_schema_mapping.json")
+STANDARD_RULES_FILE = os.path.join(CONFIG_DIR, "standard_transformation_rules.yaml")
+TARGET_RULES_FILE = os.path.join(CONFIG_DIR, "target_transformation_rules.yaml")
+
+# Parsed config files are cached here, keyed by file mtime (None disables the cache)
+CONFIG_CACHE_DIR = os.path.join(DATA_DIR, "config_cache")
+
+# Backend for the final transaction store: "csv" (FINAL_FILE), "parquet" (FINAL_STORE_DIR)
+# or "sqlite" (FINAL_DB_FILE)
+STORAGE_BACKEND = "csv"
+
+# Number of input rows read and transformed at a time (None reads whole files)
+CHUNK_SIZE = 100_000
+
+# Transform input chunks a column at a time (False applies the rules row by row)
+COLUMNAR = True
+
+# CSV parser for input files: "pyarrow" or "c" (None uses pyarrow when it is installed)
+CSV_ENGINE = None
+
+# Worker processes for parallel ingestion (None uses every CPU)
+WORKERS = None
+
+# Watch mode: seconds between scans of INPUT_DIR, and how long a file must go
+# unmodified before it is read (so files still being written are left alone)
+WATCH_POLL_INTERVAL = 1.0
+WATCH_SETTLE_TIME = 0.5
+
+# Minimum trigram similarity for matching an unknown vendor to a known one (None disables fuzzy matching)
+VENDOR_MATCH_THRESHOLD = 0.75
@@ -0,0 +1,91 @@
+import argparse
+import os
+import pandas as pd
+from ..config.config import EXPORT_DIR
+from ..storage.transaction_store import get_final_store
+from ..transformation.common_transformation import StandardToFinalTransformer
+from ..utils.file_util import write_csv_chunks_atomic
+from ..utils.logger import logger
+from ..utils.profiler import NULL_PROFILER
+
+
+# Default export file for a destination and date range
+def default_export_file(destination, start_date=None, end_date=None):
+    name = destination
+    if start_date or end_date:
+        name += f"_{start_date or ''}_{end_date or ''}"
+    return os.path.join(EXPORT_DIR, f"{name}.csv")
+
+
+# First and last day of a YYYY-MM month
+def month_range(month):
+    period = pd.Period(month, freq="M")
+    return period.start_time.strftime("%Y-%m-%d"), period.end_time.strftime("%Y-%m-%d")
+
+
+# Transform chunks of standardized transactions into the destination format,
+# with the destination's columns in mapping order
+def transform_chunks(transformer, chunks):
+    for df in chunks:
+        if df.empty:
+            continue
+        # Typed stores return dates as date objects; the target rules parse strings
+        if not pd.api.types.is_string_dtype(df["date"]):
+            df["date"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
+        df = transformer.format_output(transformer.transform_data(df))
+        yield df.reindex(columns=transformer.destination_columns)
+
+
+# The chunks, or just the empty frame if there are none
+def with_header(chunks, empty):
+    written = False
+    for df in chunks:
+        written = True
+        yield df
+    if not written:
+        yield empty
+
+
+# Stream the final store through the destination's target rules and write the
+# result to output_file chunk by chunk. Only transactions from the given sources
+# and dated between start_date and end_date (YYYY-MM-DD, inclusive) are read.
+# Returns the number of rows written.
+def export_destination(
+    destination,
+    output_file=None,
+    sources=None,
+    start_date=None,
+    end_date=None,
+    store=None,
+    profiler=NULL_PROFILER,
+):
+    store = store or get_final_store()
+    output_file = output_file or default_export_file(destination, start_date, end_date)
+    transformer = StandardToFinalTransformer(destination, columnar=True)
+    transformer.profiler = profiler
+
+    filters = {"source": list(sources)} if sources else None
+    date_range = (start_date, end_date) if start_date or end_date else None
+    chunks = store.read_chunks(
+        columns=list(transformer.source_schema_mapping), filters=filters, date_range=date_range
+    )
+    chunks = transform_chunks(transformer, profiler.iterate("read_store", chunks))
+    # Header only, for an export with no matching transactions
+    empty = pd.DataFrame(columns=transformer.destination_columns)
+    rows = write_csv_chunks_atomic(with_header(chunks, empty), output_file)
+    logger.info(f"Exported {rows} transactions to {output_file}.")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("destination", help="destination in destination_schema_mapping.json")
+    parser.add_argument("--output", help="output CSV (default: EXPORT_DIR/<destination>[_<start>_<end>].csv)")
+    parser.add_argument("--source", action="append", help="only export this source (repeatable)")
+    parser.add_argument("--start", help="first date to export, YYYY-MM-DD")
+    parser.add_argument("--end", help="last date to export, YYYY-MM-DD")
+    parser.add_argument("--month", help="export one month, YYYY-MM (sets --start and --end)")
+    args = parser.parse_args()
+
+    start_date, end_date = month_range(args.month) if args.month else (args.start, args.end)
+    export_destination(args.destination, args.output, args.source, start_date, end_date)
@@ -0,0 +1,169 @@
+import importlib.util
+import io
+import numpy as np
+import pandas as pd
+from ..config.config import CSV_ENGINE, SOURCE_SCHEMA_FILE
+from ..utils.config_registry import config_registry
+
+
+# Split a source's entry in source_schema_mapping.json into the renames to the
+# standard columns and the declared dtypes. Each source column maps either to a
+# standard column name (dtype inferred) or to {"column": name, "dtype": dtype}.
+# "numeric" columns are read as strings and converted by infer_numeric.
+def parse_source_mapping(mapping):
+    renames, dtypes = {}, {}
+    for source_column, target in mapping.items():
+        if isinstance(target, dict):
+            renames[source_column] = target["column"]
+            if target.get("dtype"):
+                dtypes[source_column] = target["dtype"]
+        else:
+            renames[source_column] = target
+    return renames, dtypes
+
+
+# Arrow type for a dtype declared in the source schema mapping
+def arrow_type(dtype):
+    import pyarrow as pa
+
+    if dtype in ["str", "string", "object", "numeric"]:
+        return pa.string()
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+# A chunk's column of strings as pandas' own type inference reads it: int64
+# (float64 with missing values) when every value is a number, otherwise the
+# strings unchanged, so invalid values like "1,200.00" reach the transformation
+# rules and are reported per row. Ids hash these values, so they must match
+# what pd.read_csv infers.
+def infer_numeric(values):
+    try:
+        return pd.to_numeric(values.to_numpy(dtype=object))
+    except (ValueError, TypeError):
+        return values
+
+
+class FileSlice(io.RawIOBase):
+    """Reads an open binary file from its position up to byte end, as if the
+    file ended there (rows appended after end are left for the next read)."""
+
+    def __init__(self, file, end):
+        self.file = file
+        self.remaining = max(0, end - file.tell())
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.file.readinto(memoryview(buffer)[:self.remaining])
+        self.remaining -= count
+        return count
+
+
+class SourceReader:
+    """Streams a source's input CSV files as DataFrames that hold only the
+    columns mapped in source_schema_mapping.json, parsed with their declared
+    dtypes. Columns are kept in file order and keep their source names.
+
+    The pyarrow engine is used when pyarrow is installed and every mapped
+    column declares a dtype (its type inference differs from pandas', e.g. it
+    parses ISO dates); otherwise the pandas C engine.
+    """
+
+    def __init__(self, source, schema_mapping=None, engine=CSV_ENGINE):
+        if schema_mapping is None:
+            schema_mapping = config_registry.load(SOURCE_SCHEMA_FILE)
+        if not schema_mapping.get(source):
+            raise ValueError(f"No schema mapping found for source: {source}")
+        self.source = source
+        self.renames, self.dtypes = parse_source_mapping(schema_mapping[source])
+
+        if engine is None:
+            typed = all(column in self.dtypes for column in self.renames)
+            engine = "pyarrow" if typed and importlib.util.find_spec("pyarrow") else "c"
+        if engine not in ["pyarrow", "c"]:
+            raise ValueError(f"Unknown CSV engine {engine}, expected 'pyarrow' or 'c'")
+        self.engine = engine
+
+    # Columns in the file's header, and the mapped ones among them in file order
+    def columns(self, file_name):
+        header = list(pd.read_csv(file_name, nrows=0).columns)
+        return header, [column for column in header if column in self.renames]
+
+    # Read a file in chunks of chunk_size rows (one chunk if None). With offset,
+    # only the rows from that byte offset on are read; with end, only the rows
+    # before that byte offset.
+    def read_chunks(self, file_name, chunk_size, offset=0, end=None):
+        header, columns = self.columns(file_name)
+        dtypes = {column: self.dtypes[column] for column in columns if column in self.dtypes}
+        numeric = [column for column, dtype in dtypes.items() if dtype == "numeric"]
+        with open(file_name, "rb") as file:
+            if offset:
+                file.seek(offset)
+            if end is not None:
+                file = io.BufferedReader(FileSlice(file, end))
+            if self.engine == "pyarrow":
+                chunks = self._read_arrow(file, header, columns, dtypes, chunk_size, offset)
+            else:
+                chunks = self._read_pandas(file, header, columns, dtypes, chunk_size, offset)
+            for df in chunks:
+                for column in numeric:
+                    df[column] = infer_numeric(df[column])
+                yield df
+
+    def _read_pandas(self, file, header, columns, dtypes, chunk_size, offset):
+        dtypes = {column: "str" if dtype == "numeric" else dtype for column, dtype in dtypes.items()}
+        kwargs = {"usecols": columns, "dtype": dtypes}
+        if offset:
+            kwargs.update(header=None, names=header)
+        try:
+            if chunk_size is None:
+                yield pd.read_csv(file, **kwargs)
+                return
+            reader = pd.read_csv(file, chunksize=chunk_size, **kwargs)
+        except pd.errors.EmptyDataError:
+            # Nothing but blank lines after the offset
+            return
+        with reader:
+            yield from reader
+
+    # pyarrow reads in blocks of bytes; batches are regrouped into chunks of
+    # chunk_size rows, indexed like pandas' chunks
+    def _read_arrow(self, file, header, columns, dtypes, chunk_size, offset):
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+
+        column_types = {column: arrow_type(dtype) for column, dtype in dtypes.items()}
+        try:
+            reader = pa_csv.open_csv(
+                file,
+                read_options=pa_csv.ReadOptions(column_names=header, skip_rows=0 if offset else 1),
+                convert_options=pa_csv.ConvertOptions(
+                    include_columns=columns, column_types=column_types, strings_can_be_null=True
+                ),
+            )
+        except pa.ArrowInvalid as e:
+            # Only an empty stream (no rows after the header or the offset)
+            # means no rows; anything else is a real parse error
+            if "Empty CSV file" not in str(e):
+                raise
+            if chunk_size is None and not offset:
+                schema = pa.schema([(column, column_types[column]) for column in columns])
+                yield schema.empty_table().to_pandas()
+            return
+        batches, rows, start = [], 0, 0
+        for batch in reader:
+            batches.append(batch)
+            rows += batch.num_rows
+            while chunk_size and rows >= chunk_size:
+                table = pa.Table.from_batches(batches, schema=reader.schema)
+                yield self._to_pandas(table.slice(0, chunk_size), start)
+                table = table.slice(chunk_size)
+                batches, rows, start = table.to_batches(), table.num_rows, start + chunk_size
+        if rows or (chunk_size is None and not offset):
+            yield self._to_pandas(pa.Table.from_batches(batches, schema=reader.schema), start)
+
+    def _to_pandas(self, table, start):
+        df = table.to_pandas()
+        df.index += start
+        return df
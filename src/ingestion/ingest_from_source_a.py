@@ -0,0 +1,8 @@
+from .common_ingestion import SourceReader
+
+
+class SourceAReader(SourceReader):
+    """Reads checking account statements (sourceA_example)."""
+
+    def __init__(self, **kwargs):
+        super().__init__("sourceA_example", **kwargs)
@@ -0,0 +1,8 @@
+from .common_ingestion import SourceReader
+
+
+class SourceBReader(SourceReader):
+    """Reads credit card statements (sourceB_example)."""
+
+    def __init__(self, **kwargs):
+        super().__init__("sourceB_example", **kwargs)
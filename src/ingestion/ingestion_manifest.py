@@ -0,0 +1,84 @@
+import hashlib
+import os
+from collections import namedtuple
+from datetime import datetime
+from ..config.config import MANIFEST_FILE
+from ..utils.file_util import load_from_json, save_to_json
+from ..utils.logger import logger
+
+# What to read from an input file: skip it entirely, or read from byte offset
+# (after the header) up to byte size. size/digest describe the content being
+# processed; rows appended after the check are left for the next run.
+IngestionPlan = namedtuple("IngestionPlan", ["skip", "offset", "rows", "size", "digest"])
+
+
+# SHA-256 of the first size bytes of a file
+def file_digest(file_name, size, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as file:
+        remaining = size
+        while remaining > 0:
+            block = file.read(min(block_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+# Whether the first offset bytes of a file end on a line boundary: after a
+# newline, or before one (a last row written without its newline, which rows
+# appended later start after)
+def ends_line(file_name, offset):
+    if not offset:
+        return True
+    with open(file_name, "rb") as file:
+        file.seek(offset - 1)
+        around = file.read(3)
+    return around[:1] == b"\n" or around[1:2] == b"\n" or around[1:3] == b"\r\n"
+
+
+class IngestionManifest:
+    """Records, per input file, the size, content hash and row count of what
+    has been processed. Unchanged files are skipped; files that only grew
+    (banks appending to the same export) are read from the processed byte
+    offset; files whose processed content changed, or whose last processed
+    row was continued, are read again in full.
+    """
+
+    def __init__(self, manifest_file=MANIFEST_FILE):
+        self.manifest_file = manifest_file
+        self._entries = None
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            if os.path.exists(self.manifest_file):
+                self._entries = load_from_json(self.manifest_file)
+            else:
+                self._entries = {}
+        return self._entries
+
+    def check(self, input_file):
+        size = os.path.getsize(input_file)
+        entry = self.entries.get(os.path.abspath(input_file))
+
+        if entry and size >= entry["size"]:
+            if file_digest(input_file, entry["size"]) == entry["sha256"]:
+                if size == entry["size"]:
+                    return IngestionPlan(True, entry["size"], entry["rows"], size, entry["sha256"])
+                if ends_line(input_file, entry["size"]):
+                    return IngestionPlan(False, entry["size"], entry["rows"], size, file_digest(input_file, size))
+        if entry:
+            logger.warning(f"{input_file} changed since it was processed, reading it again.")
+        return IngestionPlan(False, 0, 0, size, file_digest(input_file, size))
+
+    # Record that rows new rows were processed from the file as described by plan
+    def record(self, input_file, plan, rows):
+        self.entries[os.path.abspath(input_file)] = {
+            "size": plan.size,
+            "sha256": plan.digest,
+            "rows": plan.rows + rows,
+            "processed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        save_to_json(self.entries, self.manifest_file)
@@ -1,3 +1,9 @@
+import argparse
+import tempfile
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import pandas as pd
 import os
 from .transformation.transform_sources import (
@@ -7,61 +13,424 @@ from .transformation.transform_sources import (
 from .manual_processing import manual_processor
 from .config.config import (
     ARCHIVE_DIR,
+    CHUNK_SIZE,
+    COLUMNAR,
     INPUT_DIR,
-    FINAL_FILE,
     PENDING_FILE,
+    PROFILE_DIR,
+    WATCH_POLL_INTERVAL,
+    WATCH_SETTLE_TIME,
+    WORKERS,
 )
-from .utils.logger import logger
-from .utils.file_util import find_duplicate_rows, extract_csv_data
+from .utils.logger import logger, set_log_level
+from .utils.id_index import TransactionIdIndex
+from .ingestion.ingestion_manifest import IngestionManifest
+from .utils.profiler import NULL_PROFILER, RunProfiler
+from .storage.rollups import SpendingRollups
+from .storage.transaction_store import get_final_store
+from .utils.file_util import append_to_csv
+from .utils.transaction_schema import format_transactions
+
+final_store = get_final_store()
+id_index = TransactionIdIndex(final_store=final_store)
+rollups = SpendingRollups(final_store=final_store)
+manifest = IngestionManifest()
+
+# Transformer used for input files whose name starts with each prefix
+INPUT_FILE_TRANSFORMERS = {
+    "credit_card": CreditCardATransformer,
+    "checking": CheckingTransformer,
+}
+
+# Transformers built in this (worker) process, reused across files
+_transformers = {}
+
+
+# The warm transformer of a class (columnar or row by row), built on first use
+def get_transformer(transformer_class, columnar=COLUMNAR):
+    key = (transformer_class, columnar)
+    if key not in _transformers:
+        _transformers[key] = transformer_class(columnar=columnar)
+    return _transformers[key]
 
 
 def process_source_data(transformer, input_df):
     # Use transformation instance to transform data
     df = transformer.transform_data(input_df)
     print(df.head())
+    return save_transformed_data(df, transformer.profiler)
 
+
+# Split transformed rows into pending and completed and append them to the output files
+def save_transformed_data(df, profiler=NULL_PROFILER):
     # Identify rows with missing required fields
-    missing_data_df = df[df.isnull().any(axis=1)]
-    completed_df = df.dropna()
+    with profiler.stage("split_missing", len(df)):
+        missing_data_df = df[df.isnull().any(axis=1)]
+        completed_df = df.dropna()
 
     print(f"Found {len(missing_data_df)} transactions with missing data.")
     print(f"Completed processing {len(completed_df)} transactions.")
 
+    # Reject transactions that are already in the final file
+    with profiler.stage("find_duplicates", len(completed_df)):
+        completed_df, duplicates = id_index.split_new(completed_df)
+    if not duplicates.empty:
+        logger.warning(f"Rejected {len(duplicates)} duplicate transactions.")
+        logger.warning(duplicates)
+
     # Append missing data to pending file
     logger.info(f"Saving {len(missing_data_df)} transactions to pending file.")
-    save_transactions_to_file(missing_data_df, PENDING_FILE)
-    logger.info(f"Saving {len(completed_df)} transactions to final file.")
-    save_transactions_to_file(completed_df, FINAL_FILE)
+    with profiler.stage("write_pending", len(missing_data_df)):
+        save_transactions_to_file(missing_data_df, PENDING_FILE)
+    # Rollups first: a new rollup table is built from the final store as it
+    # was before this batch
+    with profiler.stage("update_rollups", len(completed_df)):
+        rollups.add(completed_df)
+    logger.info(f"Saving {len(completed_df)} transactions to final store.")
+    with profiler.stage("write_final", len(completed_df)):
+        final_store.append(completed_df)
+        id_index.add(completed_df["id"])
+        rollups.mark_current()
 
     # Return completed transactions (fully processed)
     return completed_df
 
 
+# Stream an input file through the transformer chunk by chunk, appending each
+# chunk's completed and pending rows to the output files as it goes. Files
+# already in the ingestion manifest are skipped, or only their new rows read.
+def process_source_file(transformer, input_file, chunk_size=CHUNK_SIZE, profiler=NULL_PROFILER):
+    transformer.profiler = profiler
+    completed_ids = []
+    plan = manifest.check(input_file)
+    if plan.skip:
+        logger.info(f"Skipping {input_file}, already processed.")
+        return pd.Series(name="id", dtype=object)
+    if plan.offset:
+        logger.info(f"Reading new rows of {input_file} after row {plan.rows}.")
+
+    rows = 0
+    chunks = transformer.reader.read_chunks(input_file, chunk_size, plan.offset, plan.size)
+    for chunk in profiler.iterate("read_csv", chunks):
+        rows += len(chunk)
+        completed_df = process_source_data(transformer, chunk)
+        completed_ids.append(completed_df["id"])
+    manifest.record(input_file, plan, rows)
+
+    if not completed_ids:
+        return pd.Series(name="id", dtype=object)
+    return pd.concat(completed_ids, ignore_index=True)
+
+
+# Transformer class for an input file name (None if no prefix matches)
+def input_file_transformer(file_name):
+    return next(
+        (
+            transformer_class
+            for prefix, transformer_class in INPUT_FILE_TRANSFORMERS.items()
+            if file_name.startswith(prefix)
+        ),
+        None,
+    )
+
+
+# Find the input files in a directory and the transformer class for each,
+# in file name order
+def scan_input_dir(input_dir=INPUT_DIR):
+    input_files = []
+    for file_name in sorted(os.listdir(input_dir)):
+        if not file_name.endswith(".csv"):
+            continue
+        transformer_class = input_file_transformer(file_name)
+        if transformer_class:
+            input_files.append((os.path.join(input_dir, file_name), transformer_class))
+        else:
+            logger.warning(f"No transformer found for input file: {file_name}")
+    return input_files
+
+
+# Runs in a worker process: transform every chunk of an input file from the
+# given byte offset up to byte end, writing each transformed chunk to its own pickle in
+# chunk_dir as soon as it is ready, so the worker holds one chunk at a time.
+# Returns the chunk files in order and the profiler with the worker's stages.
+def transform_source_file(
+    transformer_class,
+    input_file,
+    chunk_dir,
+    chunk_size=CHUNK_SIZE,
+    profile=False,
+    offset=0,
+    columnar=COLUMNAR,
+    end=None,
+):
+    transformer = get_transformer(transformer_class, columnar)
+    profiler = RunProfiler(input_file) if profile else NULL_PROFILER
+    transformer.profiler = profiler
+
+    profiler.start()
+    chunk_files = []
+    chunks = transformer.reader.read_chunks(input_file, chunk_size, offset, end)
+    for i, chunk in enumerate(profiler.iterate("read_csv", chunks)):
+        chunk_file = os.path.join(chunk_dir, f"{i:06d}.pkl")
+        transformer.transform_data(chunk).to_pickle(chunk_file)
+        chunk_files.append(chunk_file)
+    profiler.stop()
+    return chunk_files, profiler
+
+
+# Transform input files in a process pool. This process is the only writer:
+# workers hand back each file's transformed chunks as files in a temporary
+# directory, and this process saves them one chunk at a time in input file
+# order, so memory doesn't grow with the files and the output doesn't depend
+# on which worker finishes first. With profile=True a run report is written
+# per input file to PROFILE_DIR.
+def process_source_files_parallel(
+    input_files, workers=WORKERS, chunk_size=CHUNK_SIZE, profile=False, columnar=COLUMNAR
+):
+    completed_ids = {}
+    plans = {}
+    for input_file, _ in input_files:
+        plans[input_file] = manifest.check(input_file)
+        if plans[input_file].skip:
+            logger.info(f"Skipping {input_file}, already processed.")
+    input_files = [(f, c) for f, c in input_files if not plans[f].skip]
+
+    with (
+        tempfile.TemporaryDirectory(prefix="chunks_") as temp_dir,
+        ProcessPoolExecutor(max_workers=workers) as executor,
+    ):
+        chunk_dirs = [os.path.join(temp_dir, str(i)) for i in range(len(input_files))]
+        for chunk_dir in chunk_dirs:
+            os.mkdir(chunk_dir)
+        results = executor.map(
+            transform_source_file,
+            [transformer_class for _, transformer_class in input_files],
+            [input_file for input_file, _ in input_files],
+            chunk_dirs,
+            repeat(chunk_size),
+            repeat(profile),
+            [plans[input_file].offset for input_file, _ in input_files],
+            repeat(columnar),
+            [plans[input_file].size for input_file, _ in input_files],
+        )
+        for (input_file, _), (chunk_files, profiler) in zip(input_files, results):
+            logger.info(f"Saving transactions from {input_file}...")
+            ids = []
+            rows = 0
+            profiler.start()
+            for chunk_file in chunk_files:
+                df = pd.read_pickle(chunk_file)
+                os.remove(chunk_file)
+                rows += len(df)
+                ids.append(save_transformed_data(df, profiler)["id"])
+            profiler.stop()
+            manifest.record(input_file, plans[input_file], rows)
+            if profile:
+                logger.info(f"Wrote run report {profiler.write_report(PROFILE_DIR)}")
+            completed_ids[input_file] = (
+                pd.concat(ids, ignore_index=True) if ids else pd.Series(name="id", dtype=object)
+            )
+    return completed_ids
+
+
 def save_transactions_to_file(df, file_name):
-    if not df.empty:
-        if os.path.exists(file_name):
-            df_existing = pd.read_csv(file_name)
-            df = pd.concat([df_existing, df], ignore_index=True)
-        df.to_csv(file_name, index=False)
+    append_to_csv(format_transactions(df), file_name)
+
+
+# Move an input file to archive_dir. A file already archived under the same
+# name is kept, and this one is archived as name_1.csv, name_2.csv, ...
+# Returns the archived path.
+def archive_input_file(file_name, input_dir=INPUT_DIR, archive_dir=ARCHIVE_DIR):
+    input_file_path = os.path.join(input_dir, file_name)
+    if not os.path.exists(archive_dir):
+        os.makedirs(archive_dir)
+    stem, extension = os.path.splitext(file_name)
+    archive_path = os.path.join(archive_dir, file_name)
+    counter = 0
+    while os.path.exists(archive_path):
+        counter += 1
+        archive_path = os.path.join(archive_dir, f"{stem}_{counter}{extension}")
+    if counter:
+        logger.warning(f"{file_name} is already archived, archiving it as {os.path.basename(archive_path)}.")
+    os.rename(input_file_path, archive_path)
+    return archive_path
 
 
-def find_duplicate_rows_in_file(file_path, column):
-    df = pd.read_csv(file_path)
-    return find_duplicate_rows(df, column)
+# An input file waiting in the watch queue, and when it was last modified
+QueuedFile = namedtuple("QueuedFile", ["path", "transformer_class", "modified"])
+
+
+class InputWatcher:
+    """Watch mode: polls input_dir and processes each new input file as soon as
+    it has settled (unmodified for settle_time seconds), then archives it.
+
+    Transformers are built once per source and kept warm between files. The
+    counters report the queue depth, the files and transactions processed and
+    the processing lag: seconds from a file's last modification until it was
+    archived. A file that fails stays in input_dir and is retried once it
+    changes.
+    """
+
+    def __init__(
+        self,
+        input_dir=INPUT_DIR,
+        archive_dir=ARCHIVE_DIR,
+        poll_interval=WATCH_POLL_INTERVAL,
+        settle_time=WATCH_SETTLE_TIME,
+        chunk_size=CHUNK_SIZE,
+        columnar=COLUMNAR,
+    ):
+        self.input_dir = input_dir
+        self.archive_dir = archive_dir
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.chunk_size = chunk_size
+        self.columnar = columnar
+        self.queue = deque()
+        self._queued = set()
+        # File name -> modification time of the version that failed or was ignored
+        self._skipped = {}
+        self.files_processed = 0
+        self.files_failed = 0
+        self.transactions_added = 0
+        self.last_lag = None
+        self.max_lag = 0.0
 
+    @property
+    def counters(self):
+        now = time.time()
+        return {
+            "queue_depth": len(self.queue),
+            "oldest_queued_age": now - self.queue[0].modified if self.queue else 0.0,
+            "files_processed": self.files_processed,
+            "files_failed": self.files_failed,
+            "transactions_added": self.transactions_added,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+        }
 
-def archive_input_file(file_name):
-    input_file_path = os.path.join(INPUT_DIR, file_name)
-    if not os.path.exists(ARCHIVE_DIR):
-        os.makedirs(ARCHIVE_DIR)
-    os.rename(input_file_path, os.path.join(ARCHIVE_DIR, file_name))
+    # Queue the settled input files not already queued. Returns how many were added.
+    def poll(self):
+        if not os.path.isdir(self.input_dir):
+            return 0
+        added = 0
+        now = time.time()
+        for file_name in sorted(os.listdir(self.input_dir)):
+            path = os.path.join(self.input_dir, file_name)
+            if not file_name.endswith(".csv") or path in self._queued or not os.path.isfile(path):
+                continue
+            modified = os.path.getmtime(path)
+            if now - modified < self.settle_time or self._skipped.get(file_name) == modified:
+                continue
+            transformer_class = input_file_transformer(file_name)
+            if transformer_class is None:
+                logger.warning(f"No transformer found for input file: {file_name}")
+                self._skipped[file_name] = modified
+                continue
+            self.queue.append(QueuedFile(path, transformer_class, modified))
+            self._queued.add(path)
+            added += 1
+        return added
+
+    # Process and archive the oldest queued file
+    def process_next(self):
+        queued = self.queue.popleft()
+        self._queued.discard(queued.path)
+        file_name = os.path.basename(queued.path)
+        logger.info(f"Processing {file_name}...")
+        try:
+            completed_ids = process_source_file(
+                get_transformer(queued.transformer_class, self.columnar), queued.path, self.chunk_size
+            )
+            archive_input_file(file_name, self.input_dir, self.archive_dir)
+        except Exception:
+            logger.exception(f"Failed to process {file_name}, leaving it in {self.input_dir}.")
+            self.files_failed += 1
+            self._skipped[file_name] = queued.modified
+            return
+
+        self._skipped.pop(file_name, None)
+        self.files_processed += 1
+        self.transactions_added += len(completed_ids)
+        self.last_lag = time.time() - queued.modified
+        self.max_lag = max(self.max_lag, self.last_lag)
+        logger.info(
+            f"Added {len(completed_ids)} new transactions from {file_name} "
+            f"(lag {self.last_lag:.2f}s, {len(self.queue)} files queued)."
+        )
+
+    # Poll once and process everything queued
+    def run_once(self):
+        self.poll()
+        while self.queue:
+            self.process_next()
+
+    # Watch until interrupted (or for max_polls polls)
+    def run(self, max_polls=None):
+        logger.info(f"Watching {self.input_dir} for input files...")
+        polls = 0
+        try:
+            while True:
+                self.run_once()
+                polls += 1
+                if max_polls is not None and polls >= max_polls:
+                    break
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            logger.info("Stopped watching.")
+        logger.info(f"Watch counters: {self.counters}")
 
 
 if __name__ == "__main__":
-    input_file_names = ["credit_card_sample.csv", "checking_sample.csv"]
-    transformer_classes = [CreditCardATransformer, CheckingTransformer]
-    # input_file_names = ["source_b_sample.csv"]
-    # transformer_classes = [CreditCardATransformer]
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--parallel", action="store_true", help="process every file in INPUT_DIR in a process pool"
+    )
+    parser.add_argument("--workers", type=int, default=WORKERS, help="number of worker processes")
+    parser.add_argument(
+        "--review-by-vendor", action="store_true", help="ask for pending categories once per vendor"
+    )
+    parser.add_argument(
+        "--profile", action="store_true", help="write a JSON run report per input file to PROFILE_DIR"
+    )
+    parser.add_argument(
+        "--watch", action="store_true", help="keep running, processing and archiving new files in INPUT_DIR"
+    )
+    parser.add_argument(
+        "--poll-interval", type=float, default=WATCH_POLL_INTERVAL, help="seconds between scans in watch mode"
+    )
+    parser.add_argument(
+        "--columnar", dest="columnar", action="store_true", default=COLUMNAR,
+        help="apply the transformation rules a column at a time (default COLUMNAR)",
+    )
+    parser.add_argument(
+        "--row-by-row", dest="columnar", action="store_false", help="apply the transformation rules row by row"
+    )
+    parser.add_argument(
+        "--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="console log level (default LOG_LEVEL)"
+    )
+    args = parser.parse_args()
+    if args.log_level:
+        set_log_level(args.log_level)
+
+    if args.watch:
+        InputWatcher(poll_interval=args.poll_interval, columnar=args.columnar).run()
+        raise SystemExit
+
+    if args.parallel:
+        input_files = scan_input_dir()
+        logger.info(f"Processing {len(input_files)} input files with {args.workers or os.cpu_count()} workers...")
+        completed = process_source_files_parallel(
+            input_files, args.workers, profile=args.profile, columnar=args.columnar
+        )
+        for input_file, completed_ids in completed.items():
+            logger.info(f"Added {len(completed_ids)} new transactions from {input_file}.")
+        input_file_names, transformer_classes = [], []
+    else:
+        input_file_names = ["credit_card_sample.csv", "checking_sample.csv"]
+        transformer_classes = [CreditCardATransformer, CheckingTransformer]
+        # input_file_names = ["source_b_sample.csv"]
+        # transformer_classes = [CreditCardATransformer]
 
     for input_file_name, transformer_class in zip(
         input_file_names, transformer_classes
@@ -72,13 +441,14 @@ if __name__ == "__main__":
         input_file = os.path.join(INPUT_DIR, input_file_name)
         if input_file:
             logger.info(f"Processing {input_file_name}...")
-            t = transformer_class()
-            input_data = extract_csv_data(input_file)
-            completed_transactions = process_source_data(t, input_data)
-            duplicates = find_duplicate_rows(completed_transactions, "id")
-            if not duplicates.empty:
-                logger.warning(f"Found duplicate transactions in {input_file_name}.")
-                logger.warning(duplicates)
+            t = get_transformer(transformer_class, args.columnar)
+            profiler = RunProfiler(input_file) if args.profile else NULL_PROFILER
+            profiler.start()
+            completed_ids = process_source_file(t, input_file, profiler=profiler)
+            profiler.stop()
+            if args.profile:
+                logger.info(f"Wrote run report {profiler.write_report(PROFILE_DIR)}")
+            logger.info(f"Added {len(completed_ids)} new transactions from {input_file_name}.")
 
             # archive_input_file(input_file_name)
         else:
@@ -93,18 +463,11 @@ if __name__ == "__main__":
             choice = str(input("Invalid choice. Please enter 'Y' or 'N'.")).lower()
 
         if choice == "y":
-            pending_df = extract_csv_data(PENDING_FILE)
-            manual_processor.process_pending_transactions(pending_df)
+            pending_df = manual_processor.read_pending_file(PENDING_FILE)
+            manual_processor.process_pending_transactions(pending_df, args.review_by_vendor)
         elif choice == "n":
             print("Exiting program.")
     else:
         logger.info("No pending transactions to process.")
 
-    d = find_duplicate_rows_in_file(FINAL_FILE, "id")
-    if not d.empty:
-        logger.warning(f"Found {len(d)} duplicate transactions in final file.")
-        logger.warning(d)
-    else:
-        logger.info("No duplicate transactions found in final file.")
-
     print("Program completed.")
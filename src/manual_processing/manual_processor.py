@@ -1,130 +1,344 @@
+import argparse
+import asyncio
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 import os
-import signal
-import json
 from ..utils.logger import logger
 from ..config.config import (
     CATEGORY_CONFIG_FILE,
     PENDING_FILE,
-    FINAL_FILE,
 )
-from ..utils.file_util import load_known_vendors, load_category_list
+from ..utils.id_index import TransactionIdIndex
+from ..storage.rollups import ROLLUP_COLUMNS, SpendingRollups
+from ..storage.transaction_store import get_final_store
+from ..utils.file_util import load_known_vendors, load_category_list, load_from_json, save_to_json, write_csv_atomic
+from ..utils.transaction_schema import format_transactions
 
 
-TIMEOUT = 60  # seconds
+TIMEOUT = 60  # seconds to answer a prompt
+CHECKPOINT_EVERY = 25  # answers between writes to the pending, final and vendor files
 
-categories = load_category_list()
+# Category choices, loaded on the first prompt (see category_list)
+categories = None
 
+final_store = get_final_store()
+id_index = TransactionIdIndex(final_store=final_store)
+rollups = SpendingRollups(final_store=final_store)
 
-# Signal handler for timeout
-def timeout_handler(signum, frame):
-    raise TimeoutError("User input timed out.")
 
+# Rows and vendor categories to persist at a checkpoint: the completed rows go to
+# the final store and the remaining rows replace the pending file
+Checkpoint = namedtuple("Checkpoint", ["completed", "pending", "vendor_categories"])
 
-# Request user input for missing fields
-def request_user_input(row):
-    for column in row.index:
-        if pd.isna(row[column]):
-            logger.info("Missing value for %s: %s", column, row["vendor_long"])
-            signal.signal(signal.SIGALRM, timeout_handler)
-            signal.alarm(TIMEOUT)
-            if column == "category":
-                for idx, category in enumerate(categories, start=1):
-                    print(f"{idx}. {category}")
-                choice = int(input("Enter the number corresponding to the category: "))
-                while not (1 <= choice <= len(categories)):
-                    try:
-                        choice = int(
-                            input(
-                                "Invalid selection. Please choose a number from the list."
-                            )
-                        )
-                    except ValueError:
-                        choice = -1  # Invalid input
-                        print(
-                            "Invalid selection. Please choose a number from the list."
-                        )
-                value = str(categories[choice - 1])
-                update_pending_transactions(row["vendor_long"], value)
-                save_known_vendors(row["vendor_long"], value)
-            else:
+# A pending row to ask about: its index, vendor and the columns missing when the
+# review started
+ReviewItem = namedtuple("ReviewItem", ["index", "vendor", "columns"])
+
+
+class InputInterrupted(Exception):
+    """Ctrl-C or end of input while a prompt was waiting for an answer."""
 
-                try:
-                    value = input(f"Please provide a value for {column} (required): ")
-                except ValueError:
-                    value = None
-                    print("Invalid input. Please provide a valid value.")
-            signal.alarm(0)  # Disable the alarm
-            row[column] = value
-    return row
 
+def _resolve(future, result, error):
+    if not future.done():
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+# Read a line from the console without blocking the event loop. input() runs in
+# a daemon thread, so a prompt abandoned on timeout doesn't keep the process alive.
+async def ainput(prompt=""):
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def read():
+        try:
+            result, error = input(prompt), None
+        except (KeyboardInterrupt, EOFError):
+            # Raised as a plain exception: asyncio lets a KeyboardInterrupt in a
+            # task escape the event loop instead of reaching the review
+            result, error = None, InputInterrupted()
+        except Exception as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(_resolve, future, result, error)
+        except RuntimeError:
+            pass  # The review already ended and its loop is closed
+
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+
+# The category choices, loaded from the category file on first use
+def category_list():
+    global categories
+    if categories is None:
+        categories = load_category_list()
+    return categories
+
+
+# Request a category choice from the category list
+async def request_category():
+    categories = category_list()
+    for idx, category in enumerate(categories, start=1):
+        print(f"{idx}. {category}")
+    answer = await ainput("Enter the number corresponding to the category: ")
+    while True:
+        try:
+            choice = int(answer)
+        except ValueError:
+            choice = -1  # Invalid input
+        if 1 <= choice <= len(categories):
+            return str(categories[choice - 1])
+        answer = await ainput("Invalid selection. Please choose a number from the list.")
 
-def save_known_vendors(description, category):
+
+# Request a value for a missing field other than category
+async def request_value(column):
+    return await ainput(f"Please provide a value for {column} (required): ")
+
+
+def save_known_vendors(vendor_categories):
     known_vendors = load_known_vendors()
-    known_vendors[description] = category
-    category_file = json.load(open(CATEGORY_CONFIG_FILE))
+    known_vendors.update(vendor_categories)
+    category_file = load_from_json(CATEGORY_CONFIG_FILE)
     category_file["known_vendors"] = known_vendors
-    with open(CATEGORY_CONFIG_FILE, "w") as file:
-        json.dump(category_file, file)
+    save_to_json(category_file, CATEGORY_CONFIG_FILE)
+
+
+# Give a vendor's transactions already in the final store its new category,
+# and move their amounts in the rollups. Only stores that can update in place
+# (SqliteTransactionStore) are recategorized; the others are append-only.
+def recategorize_vendor(vendor, category):
+    if not hasattr(final_store, "set_vendor_category"):
+        return
+    history = final_store.read(columns=ROLLUP_COLUMNS, filters={"vendor_long": vendor})
+    changed = history[history["category"] != category]
+    if changed.empty:
+        return
+    final_store.set_vendor_category(vendor, category)
+    rollups.recategorize(changed, category)
+    logger.info("Recategorized %d transactions from %s as %s.", len(changed), vendor, category)
+
+
+# Persist a checkpoint: completed rows to the final store (skipping ids already
+# there) and the rollups, the remaining rows to the pending file and new vendor
+# categories to the category file and the vendors' earlier transactions
+def write_checkpoint(checkpoint):
+    df_final, duplicates = id_index.split_new(checkpoint.completed)
+    if not duplicates.empty:
+        logger.warning("Rejected %d duplicate transactions.", len(duplicates))
+    # Rollups first: a new rollup table is built from the final store as it
+    # was before this batch
+    rollups.add(df_final)
+    final_store.append(df_final)
+    id_index.add(df_final["id"])
+    rollups.mark_current()
+
+    write_csv_atomic(format_transactions(checkpoint.pending), PENDING_FILE)
+
+    if checkpoint.vendor_categories:
+        save_known_vendors(checkpoint.vendor_categories)
+        for vendor, category in checkpoint.vendor_categories.items():
+            recategorize_vendor(vendor, category)
+
+
+# The pending file with every value as read (e.g. amounts keep their "1.00"
+# form); empty cells are missing
+def read_pending_file(file_name=PENDING_FILE):
+    return pd.read_csv(file_name, dtype=str)
+
+
+class ReviewSession:
+    """Answers from a pending-review session, kept in memory.
+
+    A category chosen for a vendor is applied to every pending row of that
+    vendor at once. checkpoint() takes the completed rows out of the session
+    and returns them with a copy of the remaining rows and the new known
+    vendors, for write_checkpoint.
+    """
 
+    def __init__(self, df_pending):
+        # Object columns take any answer, e.g. a category in a column read from
+        # the pending file as all-NaN float64
+        self.df_pending = df_pending.astype(object)
+        self.vendor_categories = {}
+        self.answers = 0
+        self.completed = 0
 
-def update_pending_transactions(description, category):
-    df_pending = pd.read_csv(PENDING_FILE)
-    df_pending.loc[df_pending["vendor_long"] == description, "category"] = category
-    df_pending.to_csv(PENDING_FILE, index=False)
+    def set_category(self, vendor, category):
+        mask = (self.df_pending["vendor_long"] == vendor) & self.df_pending["category"].isna()
+        self.df_pending.loc[mask, "category"] = category
+        self.vendor_categories[vendor] = category
+        self.answers += 1
 
+    def set_value(self, index, column, value):
+        self.df_pending.loc[index, column] = value
+        self.answers += 1
 
-# Process pending transactions
-def process_pending_transactions(pending_data):
-    df_pending = pending_data
-    logger.info("Loaded %d pending transactions.", len(df_pending))
-    completed_transactions = []
+    # Columns of a review item that are still missing (none once the row was
+    # completed, e.g. by a category chosen for the same vendor)
+    def missing_columns(self, item):
+        if item.index not in self.df_pending.index:
+            return []
+        row = self.df_pending.loc[item.index]
+        return [column for column in item.columns if pd.isna(row[column])]
 
-    for index, row in df_pending.iterrows():
-        logger.debug(
-            "Processing transaction %d/%d: %s",index + 1, len(df_pending), row.to_dict()
+    def checkpoint(self):
+        complete = self.df_pending.notna().all(axis=1)
+        checkpoint = Checkpoint(
+            self.df_pending[complete], self.df_pending[~complete].copy(), self.vendor_categories
         )
-        logger.debug("Processing transaction ")
+        self.completed += int(complete.sum())
+        self.df_pending = self.df_pending[~complete]
+        self.vendor_categories = {}
+        self.answers = 0
+        return checkpoint
+
+
+class CheckpointWriter:
+    """Writes review checkpoints in the background, in order, on one worker
+    thread, so the reviewer keeps answering while the final store and pending
+    file are written. Used as an async context manager; leaving it waits for
+    the queued checkpoints. A failed write is raised by the next submit().
+    """
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.task = None
+
+    async def __aenter__(self):
+        self.task = asyncio.create_task(self.run())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.queue.put_nowait(None)
         try:
-            # Get user input for missing fields
-            updated_row = request_user_input(row)
-            # Update data frame with user input
-            df_pending.loc[index] = updated_row
+            await self.task
+        finally:
+            self.executor.shutdown()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while (checkpoint := await self.queue.get()) is not None:
+            await loop.run_in_executor(self.executor, write_checkpoint, checkpoint)
+
+    def submit(self, checkpoint):
+        if self.task.done():
+            self.task.result()
+        self.queue.put_nowait(checkpoint)
+
+    # Queue a checkpoint once enough answers have been collected
+    def checkpoint_if_due(self, session):
+        if session.answers >= CHECKPOINT_EVERY:
+            self.submit(session.checkpoint())
+
+
+# Vendors of pending rows without a category, with their row count and total
+# amount, largest first by order_by ("count" or "total_amount")
+def vendor_groups(df_pending, order_by="count"):
+    missing = df_pending[df_pending["category"].isna()]
+    groups = (
+        missing.assign(amount=pd.to_numeric(missing["amount"], errors="coerce"))
+        .groupby("vendor_long")
+        .agg(count=("vendor_long", "size"), total_amount=("amount", "sum"))
+    )
+    return groups.sort_values(order_by, ascending=False, kind="stable")
+
+
+# Ask for a category once per vendor and apply it to all of the vendor's rows
+async def review_vendor_groups(session, writer, order_by="count"):
+    groups = vendor_groups(session.df_pending, order_by)
+    for position, (vendor, group) in enumerate(groups.iterrows(), start=1):
+        logger.info(
+            "Missing category for %s (%d transactions, total %.2f) [%d/%d]",
+            vendor, group["count"], group["total_amount"], position, len(groups),
+        )
+        category = await asyncio.wait_for(request_category(), TIMEOUT)
+        session.set_category(vendor, category)
+        writer.checkpoint_if_due(session)
+
+
+# Pending rows with missing values, in order. The missing mask is computed once
+# for all rows up front.
+def review_items(df_pending):
+    missing = df_pending.isnull()
+    columns = missing.columns.to_numpy()
+    values = missing.to_numpy()
+    vendors = df_pending["vendor_long"].to_numpy()
+    for i in np.flatnonzero(values.any(axis=1)):
+        yield ReviewItem(df_pending.index[i], vendors[i], list(columns[values[i]]))
+
+
+# Ask for the missing fields of each remaining pending row. The missing
+# columns of every row are found once up front (review_items), so moving to
+# the next row costs nothing while the reviewer waits.
+async def review_rows(session, writer):
+    total = int(session.df_pending.isnull().any(axis=1).sum())
+    for position, item in enumerate(review_items(session.df_pending), start=1):
+        columns = session.missing_columns(item)
+        if not columns:
+            continue
+        logger.debug("Processing transaction %d/%d", position, total)
+
+        for column in columns:
+            logger.info("Missing value for %s: %s", column, item.vendor)
+            if column == "category":
+                category = await asyncio.wait_for(request_category(), TIMEOUT)
+                session.set_category(item.vendor, category)
+            else:
+                value = await asyncio.wait_for(request_value(column), TIMEOUT)
+                session.set_value(item.index, column, value)
+        writer.checkpoint_if_due(session)
+
+
+async def review_pending_transactions(session, group_by_vendor=False, order_by="count"):
+    async with CheckpointWriter() as writer:
+        try:
+            if group_by_vendor:
+                await review_vendor_groups(session, writer, order_by)
+            await review_rows(session, writer)
         except TimeoutError:
             logger.info("\nExiting data review due to timeout (%d seconds)", TIMEOUT)
-            break
-        except KeyboardInterrupt:
+        except (InputInterrupted, asyncio.CancelledError):
             logger.info("\nExiting data review due to keyboard interrupt")
-            break
-
-        if updated_row.isnull().sum() == 0:
-            # Move to final if no missing fields
-            completed_transactions.append(updated_row)
-
-    # Save remaining pending transactions back to pending file
-    df_pending = df_pending[df_pending.isnull().any(axis=1)]
-    df_pending.to_csv(PENDING_FILE, index=False)
-
-    # Save completed transactions to final file
-    # TODO: generate new final file each time
-    if completed_transactions:
-        df_final = pd.DataFrame(completed_transactions)
-        if os.path.exists(FINAL_FILE):
-            df_final_existing = pd.read_csv(FINAL_FILE)
-            df_final = pd.concat([df_final_existing, df_final], ignore_index=True)
-        df_final.to_csv(FINAL_FILE, index=False)
-
-    if len(df_pending) > 0:
+        except Exception:
+            logger.exception("Data review failed, saving the answers given so far")
+            raise
+        finally:
+            writer.submit(session.checkpoint())
+
+
+# Process pending transactions. With group_by_vendor, categories are asked once
+# per vendor (largest groups first, see vendor_groups) before the row-by-row pass.
+# Each prompt times out after TIMEOUT seconds, which ends the review.
+def process_pending_transactions(pending_data, group_by_vendor=False, order_by="count"):
+    session = ReviewSession(pending_data)
+    logger.info("Loaded %d pending transactions.", len(pending_data))
+
+    asyncio.run(review_pending_transactions(session, group_by_vendor, order_by))
+
+    if len(session.df_pending) > 0:
         logger.warning(
-            "Exiting data review. %d transactions still need to be processed.", len(df_pending)
+            "Exiting data review. %d transactions still need to be processed.", len(session.df_pending)
         )
 
-    logger.info("Successfully processed %d transactions.", len(completed_transactions))
-
+    logger.info("Successfully processed %d transactions.", session.completed)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--by-vendor", action="store_true", help="ask for categories once per vendor")
+    parser.add_argument("--order-by", choices=["count", "total_amount"], default="count")
+    args = parser.parse_args()
+
     print("Starting manual transaction processing...")
     if not os.path.exists(PENDING_FILE):
         logger.info("No pending transactions to process.")
     else:
-        process_pending_transactions(pd.read_csv(PENDING_FILE))
+        process_pending_transactions(read_pending_file(), args.by_vendor, args.order_by)
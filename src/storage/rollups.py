@@ -0,0 +1,154 @@
+import argparse
+import os
+import sqlite3
+import pandas as pd
+from ..config.config import ROLLUP_FILE
+from .transaction_store import read_store_fingerprint, write_store_fingerprint
+from ..utils.logger import logger
+from ..utils.transaction_schema import STANDARD_DTYPES, apply_dtypes
+
+# Groups of the rollups, and the transaction columns they are computed from
+ROLLUP_KEYS = ["month", "source", "category", "type"]
+ROLLUP_COLUMNS = ["date", "source", "category", "type", "amount"]
+
+
+# Sum (in cents) and count of amounts per group of a batch of transactions.
+# Missing group values are grouped under "".
+def aggregate(df):
+    df = apply_dtypes(df.reindex(columns=ROLLUP_COLUMNS), STANDARD_DTYPES)
+    # Group on the month as datetime64[M]; only the groups are formatted
+    months = pd.Series(df["date"].to_numpy().astype("datetime64[M]"), index=df.index, name="month")
+    amounts = df["amount"].fillna(0).astype("int64")
+    keys = [months] + [df[key].astype(object).rename(key) for key in ROLLUP_KEYS[1:]]
+    totals = amounts.groupby(keys, dropna=False).agg(["sum", "count"]).reset_index()
+    totals["month"] = totals["month"].dt.strftime("%Y-%m")
+    totals[ROLLUP_KEYS] = totals[ROLLUP_KEYS].fillna("")
+    return totals.rename(columns={"sum": "amount_cents"})
+
+
+class SpendingRollups:
+    """Materialized sum and count of amounts by month, source, category and
+    type, for questions like "restaurant spend per month per card" without
+    re-reading the final store.
+
+    Kept in a SQLite table next to the final store and updated with each batch
+    of completed transactions (add, before the batch is appended to the store,
+    then mark_current once it is) and each vendor recategorized in the final
+    store (recategorize). The table is built from the final store when it
+    doesn't exist yet or was last updated for another store, or another state
+    of the store (see read_store_fingerprint); rebuild() recomputes it.
+    """
+
+    def __init__(self, rollup_file=ROLLUP_FILE, final_store=None):
+        self.rollup_file = rollup_file
+        self.final_store = final_store
+        self._connection = None
+
+    @property
+    def store(self):
+        if self.final_store is None:
+            from .transaction_store import get_final_store
+
+            self.final_store = get_final_store()
+        return self.final_store
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.rollup_file) or ".", exist_ok=True)
+            # Not tied to the opening thread: the review writes from a worker thread
+            self._connection = sqlite3.connect(self.rollup_file, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS rollups ("
+                "month TEXT, source TEXT, category TEXT, type TEXT, "
+                "amount_cents INTEGER NOT NULL, count INTEGER NOT NULL, "
+                "PRIMARY KEY (month, source, category, type)) WITHOUT ROWID"
+            )
+            if read_store_fingerprint(self._connection) != self.store.fingerprint():
+                self.rebuild()
+        return self._connection
+
+    # Add the aggregates of df to the rollups (subtract them with sign=-1)
+    def _apply(self, connection, df, sign=1):
+        if df.empty:
+            return
+        totals = aggregate(df)
+        connection.executemany(
+            "INSERT INTO rollups (month, source, category, type, amount_cents, count) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (month, source, category, type) DO UPDATE SET "
+            "amount_cents = amount_cents + excluded.amount_cents, count = count + excluded.count",
+            (
+                (*keys, sign * int(amount), sign * int(count))
+                for *keys, amount, count in totals.itertuples(index=False)
+            ),
+        )
+        if sign < 0:
+            connection.execute("DELETE FROM rollups WHERE count <= 0")
+
+    # Add a batch about to be appended to the final store
+    def add(self, df):
+        with self.connection as connection:
+            self._apply(connection, df)
+
+    # Record that the final store, with the batches added so far, is what the
+    # rollups hold
+    def mark_current(self):
+        write_store_fingerprint(self.connection, self.store.fingerprint())
+
+    # Move transactions (as they were before) to a new category
+    def recategorize(self, df, category):
+        with self.connection as connection:
+            self._apply(connection, df, sign=-1)
+            self._apply(connection, df.assign(category=category))
+
+    # Recompute the rollups from the transactions in the final store
+    def rebuild(self):
+        connection = self.connection
+        rows = 0
+        with connection:
+            connection.execute("DELETE FROM rollups")
+            for chunk in self.store.read_chunks(columns=ROLLUP_COLUMNS):
+                self._apply(connection, chunk)
+                rows += len(chunk)
+        self.mark_current()
+        logger.info(f"Built spending rollups from {rows} transactions in the final store.")
+
+    # Rollups matching filters (e.g. {"category": "Restaurant", "month": ["2023-10", "2023-11"]}),
+    # with amounts in dollars
+    def read(self, filters=None):
+        conditions, params = [], []
+        for column, value in (filters or {}).items():
+            if column not in ROLLUP_KEYS:
+                raise ValueError(f"Unknown rollup column {column}, expected one of {ROLLUP_KEYS}")
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params += values
+        sql = "SELECT month, source, category, type, amount_cents, count FROM rollups"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY month, source, category, type"
+        df = pd.DataFrame.from_records(
+            self.connection.execute(sql, params).fetchall(), columns=ROLLUP_KEYS + ["amount_cents", "count"]
+        )
+        df["amount"] = df.pop("amount_cents").astype("int64") / 100
+        return df[ROLLUP_KEYS + ["amount", "count"]]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    for key in ROLLUP_KEYS:
+        parser.add_argument(f"--{key}", action="append", help=f"only show this {key} (repeatable)")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the rollups from the final store")
+    args = parser.parse_args()
+
+    rollups = SpendingRollups()
+    if args.rebuild:
+        rollups.rebuild()
+    filters = {key: getattr(args, key) for key in ROLLUP_KEYS if getattr(args, key)}
+    print(rollups.read(filters).to_string(index=False))
@@ -0,0 +1,339 @@
+import os
+import sqlite3
+import uuid
+from datetime import date
+import pandas as pd
+from ..config.config import FINAL_DB_FILE, FINAL_FILE, FINAL_STORE_DIR, STORAGE_BACKEND
+from ..utils.file_util import append_to_csv
+from ..utils.transaction_schema import DATE_FORMAT, STANDARD_DTYPES, apply_dtypes, format_transactions
+
+PARTITION_COLUMNS = ["source", "month"]
+
+
+# Keep rows whose columns match the filters. Each filter value is either a
+# single value or a list of allowed values.
+def apply_filters(df, filters):
+    for column, value in (filters or {}).items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        df = df[df[column].isin(values)]
+    return df
+
+
+# Keep rows dated within date_range: (start, end) as YYYY-MM-DD, inclusive,
+# either end may be None
+def apply_date_range(df, date_range):
+    start, end = date_range or (None, None)
+    if start:
+        df = df[df["date"] >= start]
+    if end:
+        df = df[df["date"] <= end]
+    return df
+
+
+# Files derived from a store (the id index, the rollups) keep the fingerprint of
+# the store as of their last update in a one-row table, and are rebuilt when it
+# no longer matches (another backend or path, or a store changed without them)
+def read_store_fingerprint(connection):
+    connection.execute("CREATE TABLE IF NOT EXISTS store_fingerprint (fingerprint TEXT NOT NULL)")
+    row = connection.execute("SELECT fingerprint FROM store_fingerprint").fetchone()
+    return row[0] if row else None
+
+
+def write_store_fingerprint(connection, fingerprint):
+    with connection:
+        connection.execute("DELETE FROM store_fingerprint")
+        connection.execute("INSERT INTO store_fingerprint (fingerprint) VALUES (?)", (fingerprint,))
+
+
+class TransactionStore:
+    """Append-only store for standardized transactions."""
+
+    def append(self, df):
+        raise NotImplementedError
+
+    # Backend, location and state of the store, which changes with every append
+    # (see read_store_fingerprint)
+    def fingerprint(self):
+        raise NotImplementedError
+
+    # Read the store in chunks, optionally only some columns, rows matching
+    # filters (e.g. {"month": "2023-10", "category": "Restaurant"}) and rows
+    # dated within date_range (see apply_date_range). Requested columns the
+    # store doesn't have come back empty.
+    def read_chunks(self, columns=None, filters=None, date_range=None):
+        raise NotImplementedError
+
+    # Read the store into one DataFrame (same arguments as read_chunks)
+    def read(self, columns=None, filters=None, date_range=None):
+        chunks = list(self.read_chunks(columns, filters, date_range))
+        if not chunks:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(chunks, ignore_index=True)
+
+
+class CsvTransactionStore(TransactionStore):
+    def __init__(self, file_name=FINAL_FILE, chunk_size=100_000):
+        self.file_name = file_name
+        self.chunk_size = chunk_size
+
+    def append(self, df):
+        append_to_csv(format_transactions(df), self.file_name)
+
+    def fingerprint(self):
+        size = os.path.getsize(self.file_name) if os.path.exists(self.file_name) else 0
+        return f"csv:{os.path.abspath(self.file_name)}:{size}"
+
+    def read_chunks(self, columns=None, filters=None, date_range=None):
+        if not os.path.exists(self.file_name):
+            return
+
+        filters = dict(filters or {})
+        month = filters.pop("month", None)
+        usecols = None
+        if columns is not None:
+            needed = set(columns) | set(filters) | ({"date"} if month or date_range else set())
+            usecols = lambda column: column in needed
+
+        with pd.read_csv(self.file_name, usecols=usecols, chunksize=self.chunk_size) as reader:
+            for chunk in reader:
+                if month:
+                    chunk = apply_filters(chunk.assign(month=chunk["date"].str[:7]), {"month": month})
+                chunk = apply_date_range(apply_filters(chunk, filters), date_range)
+                if columns is not None:
+                    yield chunk.reindex(columns=list(columns))
+                else:
+                    yield chunk.drop(columns="month", errors="ignore")
+
+
+class ParquetTransactionStore(TransactionStore):
+    """Typed Parquet dataset partitioned by source and month (hive layout:
+    source=<source>/month=<YYYY-MM>/part-<uuid>.parquet). Appends add new part
+    files; reads only touch the requested columns and matching partitions.
+    Amounts and balances are stored as integer cents; reads return them in
+    dollars, like the other stores. Requires pyarrow.
+    """
+
+    def __init__(self, root_dir=FINAL_STORE_DIR):
+        self.root_dir = root_dir
+
+    # Columns of STANDARD_DTYPES as Arrow columns: cents as int64 (like the
+    # SQLite store), dates as date32 and the rest as strings, plus the month
+    # partition
+    def _to_table(self, df):
+        import pyarrow as pa
+
+        columns = [column for column in STANDARD_DTYPES if column in df.columns]
+        df = apply_dtypes(df[columns].copy(), STANDARD_DTYPES)
+        month = df["date"].dt.strftime("%Y-%m")
+        fields = []
+        for column in columns:
+            dtype = STANDARD_DTYPES[column]
+            if dtype == "cents":
+                fields.append(pa.field(column, pa.int64()))
+            elif dtype == "date":
+                fields.append(pa.field(column, pa.date32()))
+                df[column] = df[column].dt.date
+            else:
+                fields.append(pa.field(column, pa.string()))
+                df[column] = df[column].astype("string")
+        fields.append(pa.field("month", pa.string()))
+        df["month"] = month
+        return pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
+
+    def append(self, df):
+        if df.empty:
+            return
+        import pyarrow.dataset as ds
+
+        ds.write_dataset(
+            self._to_table(df),
+            self.root_dir,
+            format="parquet",
+            partitioning=PARTITION_COLUMNS,
+            partitioning_flavor="hive",
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+    def fingerprint(self):
+        files = size = 0
+        for dir_path, _, file_names in os.walk(self.root_dir):
+            for file_name in file_names:
+                files += 1
+                size += os.path.getsize(os.path.join(dir_path, file_name))
+        return f"parquet:{os.path.abspath(self.root_dir)}:{files}:{size}"
+
+    def read_chunks(self, columns=None, filters=None, date_range=None, batch_size=100_000):
+        if not os.path.exists(self.root_dir):
+            return
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(self.root_dir, format="parquet", partitioning="hive")
+        conditions = []
+        for column, value in (filters or {}).items():
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            conditions.append(ds.field(column).isin(values))
+        start, end = date_range or (None, None)
+        # Bounds on month too, so only the partitions in range are opened
+        if start:
+            conditions.append(ds.field("month") >= start[:7])
+            conditions.append(ds.field("date") >= pa.scalar(date.fromisoformat(start), pa.date32()))
+        if end:
+            conditions.append(ds.field("month") <= end[:7])
+            conditions.append(ds.field("date") <= pa.scalar(date.fromisoformat(end), pa.date32()))
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        stored = [column for column in columns if column in dataset.schema.names] if columns else None
+        for batch in dataset.to_batches(columns=stored, filter=expression, batch_size=batch_size):
+            df = batch.to_pandas()
+            # Cents are read back in dollars, like the other stores
+            for column in df.columns:
+                if STANDARD_DTYPES.get(column) == "cents":
+                    df[column] = df[column].astype("float64") / 100
+            if columns is not None:
+                yield df.reindex(columns=list(columns))
+            else:
+                yield df.drop(columns="month", errors="ignore")
+
+
+class SqliteTransactionStore(TransactionStore):
+    """Transactions in one SQLite table keyed by id, with indexes on date,
+    source, vendor_long and category, so single transactions and filtered
+    reads don't scan the whole store. Amounts and balances are stored as
+    integer cents and dates as YYYY-MM-DD text; reads return amounts in
+    dollars, like the other stores.
+
+    append() upserts: a transaction whose id is already stored is replaced.
+    The connection is opened on first use.
+    """
+
+    SQL_TYPES = {"cents": "INTEGER"}
+    INDEXED_COLUMNS = ["date", "source", "vendor_long", "category"]
+
+    def __init__(self, db_file=FINAL_DB_FILE, chunk_size=100_000):
+        self.db_file = db_file
+        self.chunk_size = chunk_size
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.db_file) or ".", exist_ok=True)
+            # Not tied to the opening thread: the review writes from a worker thread
+            self._connection = sqlite3.connect(self.db_file, check_same_thread=False)
+            columns = ", ".join(
+                f"{column} {self.SQL_TYPES.get(dtype, 'TEXT')}" + (" PRIMARY KEY" if column == "id" else "")
+                for column, dtype in STANDARD_DTYPES.items()
+            )
+            with self._connection:
+                self._connection.execute(f"CREATE TABLE IF NOT EXISTS transactions ({columns})")
+                for column in self.INDEXED_COLUMNS:
+                    self._connection.execute(
+                        f"CREATE INDEX IF NOT EXISTS transactions_{column} ON transactions ({column})"
+                    )
+        return self._connection
+
+    # Column values as Python objects for sqlite3 (None for missing values)
+    def _sql_values(self, df):
+        df = apply_dtypes(df.copy(), STANDARD_DTYPES)
+        values = []
+        for column in df.columns:
+            column_values = df[column]
+            if STANDARD_DTYPES[column] == "date":
+                column_values = column_values.dt.strftime(DATE_FORMAT)
+            column_values = column_values.astype(object)
+            values.append(column_values.where(column_values.notna(), None).tolist())
+        return values
+
+    def append(self, df):
+        if df.empty:
+            return
+        if "id" not in df.columns:
+            raise ValueError("Transactions need an id column to be stored")
+        columns = [column for column in STANDARD_DTYPES if column in df.columns]
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != "id")
+        sql = (
+            f"INSERT INTO transactions ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (id) DO {f'UPDATE SET {updates}' if updates else 'NOTHING'}"
+        )
+        rows = zip(*self._sql_values(df[columns]))
+        with self.connection:
+            self.connection.executemany(sql, rows)
+
+    # Rows are never deleted, so the last rowid changes with every new transaction
+    def fingerprint(self):
+        last_rowid = None
+        if self._connection is not None or os.path.exists(self.db_file):
+            last_rowid = self.connection.execute("SELECT max(rowid) FROM transactions").fetchone()[0]
+        return f"sqlite:{os.path.abspath(self.db_file)}:{last_rowid or 0}"
+
+    # Set the category of every stored transaction of a vendor. Returns the
+    # number of transactions changed.
+    def set_vendor_category(self, vendor, category):
+        with self.connection:
+            cursor = self.connection.execute(
+                "UPDATE transactions SET category = ? WHERE vendor_long = ? AND category IS NOT ?",
+                (category, vendor, category),
+            )
+        return cursor.rowcount
+
+    def read_chunks(self, columns=None, filters=None, date_range=None):
+        if self._connection is None and not os.path.exists(self.db_file):
+            return
+        conditions, params = [], []
+        for column, value in (filters or {}).items():
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            if column == "month":
+                column = "substr(date, 1, 7)"
+            elif column not in STANDARD_DTYPES:
+                raise ValueError(f"Unknown column {column}")
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params += [str(value) for value in values]
+        start, end = date_range or (None, None)
+        if start:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end:
+            conditions.append("date <= ?")
+            params.append(end)
+
+        stored = [column for column in columns if column in STANDARD_DTYPES] if columns else list(STANDARD_DTYPES)
+        selected = [
+            f"{column} / 100.0" if STANDARD_DTYPES[column] == "cents" else column for column in stored
+        ]
+        sql = f"SELECT {', '.join(selected) or 'NULL'} FROM transactions"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+
+        cursor = self.connection.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                return
+            df = pd.DataFrame.from_records(rows, columns=stored if stored else None)
+            for column in stored:
+                if STANDARD_DTYPES[column] == "cents":
+                    df[column] = df[column].astype("float64")
+            yield df.reindex(columns=list(columns)) if columns is not None else df
+
+
+STORAGE_BACKENDS = {
+    "csv": CsvTransactionStore,
+    "parquet": ParquetTransactionStore,
+    "sqlite": SqliteTransactionStore,
+}
+
+_final_store = None
+
+
+# Store for completed transactions, using the configured STORAGE_BACKEND
+def get_final_store():
+    global _final_store
+    if _final_store is None:
+        if STORAGE_BACKEND not in STORAGE_BACKENDS:
+            raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+        _final_store = STORAGE_BACKENDS[STORAGE_BACKEND]()
+    return _final_store
@@ -1,24 +1,73 @@
 from datetime import datetime
+from functools import lru_cache
 import pandas as pd
 import os
-from ..config.config import CONFIG_DIR
-from ..utils.file_util import hash_row, load_known_vendors, load_category_list, extract_csv_data, load_from_json, load_from_yaml
+from ..config.config import (
+    CONFIG_DIR,
+    DESTINATION_SCHEMA_FILE,
+    SOURCE_SCHEMA_FILE,
+    STANDARD_RULES_FILE,
+    TARGET_RULES_FILE,
+)
+from ..ingestion.common_ingestion import SourceReader, parse_source_mapping
+from ..utils.file_util import hash_row, hash_rows, extract_csv_data, load_from_json, load_from_yaml
+from ..utils.category_lookup import category_lookup
+from ..utils.config_registry import config_registry
+from .transformation_plan import RuleErrors, TransformationPlan, TransformationStep, validate_rule
 from ..utils.logger import logger
+from ..utils.profiler import NULL_PROFILER
+from ..utils.transaction_schema import STANDARD_DTYPES, apply_dtypes, format_columns, to_cents
+
+
+# Parse a date string with the first matching format. Statements repeat the same
+# dates many times, so results are memoized.
+@lru_cache(maxsize=4096)
+def parse_date(value, formats):
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    return None
 
 
 class Transformer:
-    def __init__(self, source, transform_rules, schema_mapping):
+    possible_date_formats = [
+        "%Y-%m-%d",  # e.g., 2023-10-22
+        "%m/%d/%Y",  # e.g., 10/22/2023
+        "%m/%d/%y",  # e.g., 10/22/23
+        "%d-%m-%Y",  # e.g., 22-10-2023
+        "%Y.%m.%d",  # e.g., 2023.10.22
+        # Add more formats as needed based on the expected input
+    ]
+    # Types of the output columns (see transaction_schema.apply_dtypes), on top of
+    # "cents" and "date" for the format_currency and format_date rule columns
+    column_dtypes = {}
+
+    def __init__(self, source, transform_rules, schema_mapping, columnar=False):
         self.source = source
         self.transform_rules = transform_rules
-        self.source_schema_mapping = schema_mapping.get(source, None)
+        # Source column -> standard column (dtypes are applied by the SourceReader)
+        self.source_schema_mapping = parse_source_mapping(schema_mapping.get(source) or {})[0]
+        # Run rules as whole-column operations instead of per-cell applies
+        self.columnar = columnar
+        # Per-row errors from the last columnar run (has_error mask + error message)
+        self.errors = None
+        # Records time and memory per stage and rule when profiling is enabled
+        self.profiler = NULL_PROFILER
+        # Rule failures of the chunk being transformed, logged as one summary
+        self.rule_errors = RuleErrors()
+        self._step = None
 
         if not self.source_schema_mapping:
             raise ValueError(f"No schema mapping found for source: {self.source}")
+        self.plan = self.compile_plan(transform_rules)
         print(f"Loaded transformation rules for source: {source}")
 
     # Apply schema mapping to normalize source data to the target schema
     def normalize_schema(self, df):
-        # Remove any columns that are not in the target schema
+        # Remove any columns that are not in the target schema (none when the
+        # data was read by a SourceReader, which only loads mapped columns)
         # source_schema_mapping = self.source_schema_mapping
         df.drop(
             columns=[col for col in df.columns if col not in self.source_schema_mapping],
@@ -29,75 +78,209 @@ class Transformer:
 
         return df
 
-    # Apply transformation based on rules
-    def apply_transformation(self, df):
-        for rule in self.transform_rules["transformations"]:
+    # Compile the transformation rules into a plan of bound column operations
+    def compile_plan(self, transform_rules):
+        steps = []
+        self.output_dtypes = dict(self.column_dtypes)
+        self.date_formats = {}
+        for rule in transform_rules["transformations"]:
+            validate_rule(rule)
             column = rule["column"]
             operation = rule["operation"]
             params = rule["params"]
+            if operation == "format_currency":
+                self.output_dtypes[column] = "cents"
+            elif operation == "format_date":
+                self.output_dtypes[column] = "date"
+                self.date_formats[column] = params["format"]
+            if self.columnar:
+                apply_present, apply_missing = self._compile_columnar_rule(column, operation, params)
+            else:
+                apply_present, apply_missing = self._compile_rule(column, operation, params)
+            steps.append(
+                TransformationStep(column, operation, params["required"], apply_present, apply_missing)
+            )
+        return TransformationPlan(steps)
+
+    # Row-by-row operations for a rule
+    def _compile_rule(self, column, operation, params):
+        apply_present = None
+
+        if operation == "truncate":
+            max_length = params["max_length"]
+
+            def apply_present(df):
+                df[column] = df[column].apply(
+                    lambda x: self._safe_apply(self.truncate_string, x, max_length)
+                )
+        elif operation == "validate_unique":
+            def apply_present(df):
+                self.validate_unique(df, column)
+        elif operation == "validate_value":
+            allowed_values = params["allowed_values"]
+
+            def apply_present(df):
+                df[column] = df[column].apply(
+                    lambda x: self._safe_apply(self.validate_value, x, allowed_values)
+                )
+        elif operation == "format_currency":
+            format_str = params["format"]
+
+            def apply_present(df):
+                df[column] = df[column].apply(
+                    lambda x: self._safe_apply(self.format_currency, x, format_str, 0)
+                )
+        elif operation == "format_date":
+            format_str = params["format"]
+
+            def apply_present(df):
+                df[column] = df[column].apply(
+                    lambda x: self._safe_apply(self.format_date, x, format_str)
+                )
+        elif operation == "assign_category":
+            def apply_present(df):
+                df[column] = df.apply(
+                    lambda x: self._safe_apply(self.assign_category, x["vendor_long"], x["category"]),
+                    axis=1,
+                )
+
+        # Required column is missing
+        if operation == "assign_category":
+            # Vendors that can't be categorized leave only their own rows unset
+            def fill_missing(df):
+                return df.apply(lambda x: self._safe_apply(self.assign_category, x["vendor_long"]), axis=1)
+        elif operation == "validate_value":
+            allowed_values = params["allowed_values"]
+
+            def fill_missing(df):
+                return df.apply(lambda x: self.validate_value(None, allowed_values), axis=1)
+        elif operation == "hash_row" and params.get("id_format", "md5") == "md5":
+            hash_columns = params.get("hash_columns")
+
+            def fill_missing(df):
+                if not hash_columns:
+                    return df.apply(lambda x: hash_row(x, df.columns), axis=1)
+                return df.apply(lambda x: hash_row(x.reindex(hash_columns), hash_columns), axis=1)
+        elif operation == "hash_row":
+            def fill_missing(df):
+                return self.hash_row_column(df, params.get("hash_columns"), params["id_format"])
+        elif operation == "add_source":
+            source = self.truncate_string(self.source, params["max_length"])
+
+            def fill_missing(df):
+                return source
+        else:
+            def fill_missing(df):
+                return df.apply(lambda x: pd.NA)
 
-            if column in df.columns:
-                if operation == "truncate":
-                    df[column] = df[column].apply(
-                        lambda x: self._safe_apply(self.truncate_string,x, params["max_length"])
-                    )
-                elif operation == "validate_unique":
-                    self.validate_unique(df, column)
-                elif operation == "validate_value":
-                    df[column] = df[column].apply(
-                        lambda x: self._safe_apply(self.validate_value,
-                            x, params["allowed_values"]
-                        )
-                    )
-                elif operation == "format_currency":
-                    df[column] = df[column].apply(
-                        lambda x: self._safe_apply(self.format_currency,
-                            x, params["format"], 0
-                        )
-                    )
-                elif operation == "format_date":
-                    df[column] = df[column].apply(
-                        lambda x: self._safe_apply(self.format_date,
-                            x, params["format"]
-                        )
-                    )
-                elif operation == "assign_category":
-                    df[column] = df.apply(
-                        lambda x: self._safe_apply(self.assign_category,x["vendor_long"], x["category"]),
-                        axis=1,
-                    )
-            elif params["required"]:
-                # Required column is missiing
-                try:
-                    if operation == "assign_category":
-                        df[column] = df.apply(
-                            lambda x: self.assign_category(x["vendor_long"]), axis=1
-                        )
-                    elif operation == "validate_value":
-                        df[column] = df.apply(
-                            lambda x: self.validate_value(
-                                None, params["allowed_values"]
-                            ),
-                            axis=1,
-                        )
-                    elif operation == "hash_row":
-                        df[column] = df.apply(lambda x: hash_row(x, df.columns), axis=1)
-                    elif operation == "add_source":
-                        df[column] = self.truncate_string(self.source, params["max_length"])
-                    else:
-                        df[column] = df.apply(lambda x: pd.NA)
-
-                except ValueError as e:
-                    logger.error(f"Error processing column {column}: {e}")
-                    df[column] = df.apply(lambda x: pd.NA)
+        def apply_missing(df):
+            try:
+                df[column] = fill_missing(df)
+            except ValueError as e:
+                self.rule_errors.add(operation, column, None, f"Error processing column {column}: {e}")
+                df[column] = df.apply(lambda x: pd.NA)
+
+        return apply_present, apply_missing
+
+    # Whole-column operations for a rule. Instead of raising per cell, each
+    # returns a Series of error messages (NA where the row is valid); failing
+    # cells are set to NA.
+    def _compile_columnar_rule(self, column, operation, params):
+        apply_present = None
+
+        if operation == "truncate":
+            max_length = params["max_length"]
+
+            def apply_present(df):
+                df[column] = self.truncate_column(df[column], max_length)
+        elif operation == "validate_unique":
+            def apply_present(df):
+                self.validate_unique(df, column)
+        elif operation == "validate_value":
+            allowed_values = params["allowed_values"]
+
+            def apply_present(df):
+                df[column], errors = self.validate_value_column(df[column], allowed_values)
+                return errors
+        elif operation == "format_currency":
+            format_str = params["format"]
+
+            def apply_present(df):
+                df[column], errors = self.format_currency_column(df[column], format_str, 0)
+                return errors
+        elif operation == "format_date":
+            format_str = params["format"]
+
+            def apply_present(df):
+                df[column], errors = self.format_date_column(df[column], format_str)
+                return errors
+        elif operation == "assign_category":
+            def apply_present(df):
+                df[column], errors = self.assign_category_column(df["vendor_long"], df["category"])
+                return errors
+
+        # Required column is missing
+        if operation == "assign_category":
+            def apply_missing(df):
+                df[column], errors = self.assign_category_column(df["vendor_long"])
+                return errors
+        elif operation == "validate_value":
+            allowed_values = params["allowed_values"]
+
+            def apply_missing(df):
+                df[column], errors = self.validate_value_column(
+                    pd.Series(pd.NA, index=df.index, dtype=object), allowed_values
+                )
+                return errors
+        elif operation == "hash_row":
+            def apply_missing(df):
+                df[column] = self.hash_row_column(
+                    df, params.get("hash_columns"), params.get("id_format", "md5")
+                )
+        elif operation == "add_source":
+            source = self.truncate_string(self.source, params["max_length"])
+
+            def apply_missing(df):
+                df[column] = source
+        else:
+            def apply_missing(df):
+                df[column] = pd.NA
+
+        return apply_present, apply_missing
+
+    # Apply transformation based on rules
+    def apply_transformation(self, df):
+        has_error = pd.Series(False, index=df.index)
+        error = pd.Series(pd.NA, index=df.index, dtype=object)
 
+        for step in self.plan:
+            # The values before the rule, as samples of what failed
+            values = df[step.column] if step.column in df.columns else None
+            self._step = step
+            with self.profiler.stage(f"rule {step.column}: {step.operation}", len(df)):
+                errors = step.apply(df)
+            self._step = None
+
+            if errors is not None and errors.notna().any():
+                failed = errors.notna()
+                self.rule_errors.add_column(step.operation, step.column, errors, values)
+                error = error.where(~failed | error.isna(), error + "; " + errors)
+                error = error.fillna(errors)
+                has_error |= failed
+
+        self.rule_errors.log(logger, f" in {len(df)} rows from {self.source}")
+        if self.columnar:
+            self.errors = pd.DataFrame({"has_error": has_error, "error": error})
         return df
-    
+
+    # Call a row-by-row rule function; a ValueError leaves the cell NA and is
+    # counted in rule_errors against the rule being applied
     def _safe_apply(self, func, *args, **kwargs):
         try:
             return func(*args, **kwargs)
         except ValueError as e:
-            logger.error(f"{e}")
+            operation, column = (self._step.operation, self._step.column) if self._step else (func.__name__, None)
+            self.rule_errors.add(operation, column, args[0] if args else None, f"{e}")
             return pd.NA
 
     # Truncate a string to a maximum length
@@ -122,17 +305,28 @@ class Transformer:
                 f"Invalid value: {value} at row {None}. Allowed values are: {allowed_values}" #Todo: add row number
             )
         
-    # Format a currency value (e.g., ensure it's positive and formatted to 2 decimal places)
-    def format_currency(self, value, format_str, min_value):
+    # A currency value as a number. Amount columns with any non-numeric value
+    # are read as strings (see infer_numeric), so strings are parsed here.
+    def parse_currency(self, value):
         if pd.isna(value):
             raise ValueError("Missing required currency value.")
-        elif value < min_value:
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                raise ValueError("Invalid currency value.")
+        return value
+
+    # Format a currency value (e.g., ensure it's positive and formatted to 2 decimal places)
+    def format_currency(self, value, format_str, min_value):
+        number = self.parse_currency(value)
+        if number < min_value:
             raise ValueError(
                 f"Currency value {value} is below the minimum allowed: {min_value}."
             )
         else:
             try:
-                return f"{value:.2f}" #Todo: use format_str
+                return f"{number:.2f}" #Todo: use format_str
             except ValueError as e:
                 raise e
 
@@ -141,69 +335,163 @@ class Transformer:
         if pd.isna(value):
             raise ValueError("Missing required date value.")
 
-        possible_formats = [
-            "%Y-%m-%d",  # e.g., 2023-10-22
-            "%m/%d/%Y",  # e.g., 10/22/2023
-            "%m/%d/%y",  # e.g., 10/22/23
-            "%d-%m-%Y",  # e.g., 22-10-2023
-            "%Y.%m.%d",  # e.g., 2023.10.22
-            # Add more formats as needed based on the expected input
-        ]
-
-        date = None
-
-        for fmt in possible_formats:
-            try:
-                date = datetime.strptime(value, fmt)
-            except ValueError:
-                pass
+        date = parse_date(value, tuple(self.possible_date_formats))
 
         if date:
             return date.strftime(format_str)
         else:
             raise ValueError(f"Invalid date format for {value}.")
 
+    # Pick the possible date format that parses the most values in a sample of the column
+    def infer_date_format(self, values, sample_size=100):
+        sample = values.dropna().head(sample_size)
+        if sample.empty:
+            return None
+
+        best_format, best_count = None, 0
+        for fmt in self.possible_date_formats:
+            count = pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum()
+            if count > best_count:
+                best_format, best_count = fmt, count
+            if count == len(sample):
+                break
+        return best_format
+
     # Assign a category if vendor is known
     def assign_category(self, vendor, category=None):
-        known_vendors = load_known_vendors()
-
-        if vendor in known_vendors:
-            return known_vendors[vendor]
-        
-        if category and category in load_category_list():
-            return category
+        assigned = category_lookup.lookup(vendor, category)
+        if assigned is not None:
+            return assigned
 
         raise ValueError(f"Unknown vendor: {vendor}, category: {category}")
 
+    # Column version of assign_category: one Series.map over the known vendors
+    def assign_category_column(self, vendors, categories=None):
+        result = category_lookup.lookup_column(vendors, categories)
+        errors = pd.Series(pd.NA, index=vendors.index, dtype=object)
+        unknown = result.isna()
+        errors[unknown] = (
+            "Unknown vendor: " + vendors[unknown].astype(str).fillna("nan")
+            + ", category: "
+            + (categories[unknown].astype(str).fillna("nan") if categories is not None else "None")
+        )
+        return result, errors
+
+    # Truncate every string in a column to a maximum length
+    def truncate_column(self, values, max_length):
+        return values.where(values.isna(), values.astype(str).str[:max_length]).astype(object)
+
+    # Column version of validate_value
+    def validate_value_column(self, values, allowed_values):
+        missing = values.isna()
+        valid = values.isin(allowed_values) & ~missing
+        errors = pd.Series(pd.NA, index=values.index, dtype=object)
+        errors[missing] = "Missing required value for column."
+        invalid = ~valid & ~missing
+        errors[invalid] = (
+            "Invalid value: " + values[invalid].astype(str)
+            + f". Allowed values are: {allowed_values}"
+        )
+        return values.where(valid, pd.NA).astype(object), errors
+
+    # Column version of format_currency, returning integer cents (formatted with
+    # format_str only on output, see format_output)
+    def format_currency_column(self, values, format_str, min_value):
+        numbers = pd.to_numeric(values, errors="coerce")
+        missing = values.isna()
+        below_min = numbers < min_value
+        valid = numbers.notna() & ~below_min
+        errors = pd.Series(pd.NA, index=values.index, dtype=object)
+        errors[missing] = "Missing required currency value."
+        errors[numbers.isna() & ~missing] = "Invalid currency value."
+        errors[below_min] = (
+            "Currency value " + values[below_min].astype(str)
+            + f" is below the minimum allowed: {min_value}."
+        )
+        return to_cents(numbers.where(valid)), errors
+
+    # Column version of format_date, returning datetimes (formatted with format_str
+    # only on output). The format is inferred once from a sample and the whole
+    # column parsed with it; only values that don't match it fall back to
+    # parse_date, once per distinct value
+    def format_date_column(self, values, format_str):
+        text = values.where(values.isna(), values.astype(str))
+        fmt = self.infer_date_format(text)
+        if fmt:
+            dates = pd.to_datetime(text, format=fmt, errors="coerce")
+        else:
+            dates = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+
+        pending = dates.isna() & text.notna()
+        if pending.any():
+            formats = tuple(self.possible_date_formats)
+            fallback = {value: parse_date(value, formats) for value in text[pending].unique()}
+            dates = dates.astype("datetime64[ns]")
+            dates[pending] = pd.to_datetime(text[pending].map(fallback))
+
+        missing = values.isna()
+        errors = pd.Series(pd.NA, index=values.index, dtype=object)
+        errors[missing] = "Missing required date value."
+        invalid = dates.isna() & ~missing
+        errors[invalid] = "Invalid date format for " + values[invalid].astype(str) + "."
+        return dates.astype("datetime64[ns]"), errors
+
+    # Column version of hash_row: one id per row from the hash_columns (all
+    # columns if empty), in the given id format (see file_util.hash_rows)
+    def hash_row_column(self, df, hash_columns=None, id_format="md5"):
+        return hash_rows(df, hash_columns, id_format)
+
     # Main function to load data and apply transformations
     def transform_data(self, input_data):
-        df_normalized = self.normalize_schema(input_data)
-        df_transformed = self.apply_transformation(df_normalized)
+        with self.profiler.stage("normalize_schema", len(input_data)):
+            df_normalized = self.normalize_schema(input_data)
+        with self.profiler.stage("apply_transformation", len(df_normalized)):
+            df_transformed = self.apply_transformation(df_normalized)
+        # Row-by-row rules return formatted strings; parse them back into the types
+        with self.profiler.stage("apply_dtypes", len(df_transformed)):
+            df_transformed = apply_dtypes(df_transformed, self.output_dtypes, self.date_formats)
 
         return df_transformed
 
+    # Copy of transformed data with the currency and date columns formatted as
+    # their rules specify, for writing out
+    def format_output(self, df):
+        return format_columns(df, self.output_dtypes, self.date_formats)
+
 
 class SourceToStandardTransformer(Transformer):
-    def __init__(self, source):
-        # rules = load_from_yaml(os.path.join(CONFIG_DIR,"standard_transformation_rules.yaml"))
-        # schema_mapping = load_from_json(os.path.join(CONFIG_DIR,"source_schema_mapping.json"))
+    column_dtypes = STANDARD_DTYPES
+
+    def __init__(self, source, **kwargs):
+        # Rules and mappings are parsed once per process (see ConfigRegistry)
+        schema_mapping = config_registry.load(SOURCE_SCHEMA_FILE)
         super().__init__(
-            source, 
-            load_from_yaml(os.path.join(CONFIG_DIR,"standard_transformation_rules.yaml")),
-            load_from_json(os.path.join(CONFIG_DIR,"source_schema_mapping.json"))
+            source,
+            config_registry.load(STANDARD_RULES_FILE),
+            schema_mapping,
+            **kwargs
         )
+        self.reader = self.create_reader(schema_mapping)
+
+    # Reader that streams this source's input files
+    def create_reader(self, schema_mapping):
+        return SourceReader(self.source, schema_mapping)
 
 
 class StandardToFinalTransformer(Transformer):
-    def __init__(self, destination):
-        # rules = load_from_yaml(os.path.join(CONFIG_DIR,"target_transformation_rules.yaml"))
-        # schema_mapping = load_from_json(os.path.join(CONFIG_DIR,"source_schema_mapping.json"))
+    def __init__(self, destination, **kwargs):
         super().__init__(
             destination,
-            load_from_yaml(os.path.join(CONFIG_DIR,"target_transformation_rules.yaml")),
-            load_from_json(os.path.join(CONFIG_DIR,"source_schema_mapping.json"))
+            config_registry.load(TARGET_RULES_FILE),
+            config_registry.load(DESTINATION_SCHEMA_FILE),
+            **kwargs
         )
 
+    # Destination columns in the order of destination_schema_mapping.json
+    @property
+    def destination_columns(self):
+        return list(self.source_schema_mapping.values())
+
 
 # Example usage
 if __name__ == "__main__":
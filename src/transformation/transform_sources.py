@@ -1,31 +1,57 @@
+import pandas as pd
 from .common_transformation import SourceToStandardTransformer
-from ..utils.logger import logger
+from ..ingestion.ingest_from_source_a import SourceAReader
+from ..ingestion.ingest_from_source_b import SourceBReader
 
 
 class CheckingTransformer(SourceToStandardTransformer):
-    def __init__(self):
-        super().__init__("sourceA_example")
+    def __init__(self, **kwargs):
+        super().__init__("sourceA_example", **kwargs)
+
+    def create_reader(self, schema_mapping):
+        return SourceAReader(schema_mapping=schema_mapping)
 
 
 class CreditCardATransformer(SourceToStandardTransformer):
-    def __init__(self):
-        super().__init__("sourceB_example")
+    category_mapping = {"Food & Drink": "Restaurants", "Shopping": "Other"}
+    type_mapping = {"Sale": "Debit", "Payment": "Credit", "Return": "Credit"}
+
+    def __init__(self, **kwargs):
+        super().__init__("sourceB_example", **kwargs)
+
+    def create_reader(self, schema_mapping):
+        return SourceBReader(schema_mapping=schema_mapping)
 
     def assign_category(self, vendor, category=None):
-        mapping = {"Food & Drink": "Restaurants", "Shopping": "Other"}
-        if category in mapping:
-            return mapping[category]
+        if category in self.category_mapping:
+            return self.category_mapping[category]
         return super().assign_category(vendor, category)
 
+    def assign_category_column(self, vendors, categories=None):
+        result, errors = super().assign_category_column(vendors, categories)
+        if categories is not None:
+            mapped = categories.map(self.category_mapping)
+            result = result.where(mapped.isna(), mapped)
+            errors = errors.where(mapped.isna(), pd.NA)
+        return result, errors
+
     def format_currency(self, value, format_str, min_value):
+        value = self.parse_currency(value)
         if value < 0:
             value *= -1
         return super().format_currency(value, format_str, min_value)
 
     def validate_value(self, value, allowed_values):
-        mapping = {"Sale": "Debit", "Payment": "Credit", "Return": "Credit"}
-        if value in mapping:
-            return mapping[value]
-        else:
-            logger.info(f"Invalid value for CCATransformer: {value}")
+        # Unmapped values are validated as they are; failures go to rule_errors
+        if value in self.type_mapping:
+            return self.type_mapping[value]
         return super().validate_value(value, allowed_values)
+
+    def format_currency_column(self, values, format_str, min_value):
+        numbers = pd.to_numeric(values, errors="coerce")
+        # Invalid values are kept, to be reported as invalid rather than missing
+        values = values.astype(object).where(numbers.isna(), numbers.abs())
+        return super().format_currency_column(values, format_str, min_value)
+
+    def validate_value_column(self, values, allowed_values):
+        return super().validate_value_column(values.replace(self.type_mapping), allowed_values)
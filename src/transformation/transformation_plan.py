@@ -0,0 +1,168 @@
+import time
+import pandas as pd
+from ..config.config import ERROR_SAMPLES
+from ..utils.file_util import ID_FORMATS
+
+# Params each operation needs in its rule (every rule also needs "required")
+OPERATION_PARAMS = {
+    "truncate": ["max_length"],
+    "validate_unique": [],
+    "validate_value": ["allowed_values"],
+    "format_currency": ["format"],
+    "format_date": ["format"],
+    "assign_category": [],
+    "hash_row": [],
+    "add_source": ["max_length"],
+}
+
+
+# Check a rule from the transformation rules YAML before it is compiled
+def validate_rule(rule):
+    column = rule.get("column")
+    operation = rule.get("operation")
+    if column is None:
+        raise ValueError(f"Transformation rule has no column: {rule}")
+    if operation not in OPERATION_PARAMS:
+        raise ValueError(f"Unknown operation {operation} for column {column}")
+
+    params = rule.get("params") or {}
+    missing = [p for p in ["required"] + OPERATION_PARAMS[operation] if p not in params]
+    if missing:
+        raise ValueError(
+            f"Missing params {missing} for operation {operation} on column {column}"
+        )
+    if operation == "hash_row" and params.get("id_format", "md5") not in ID_FORMATS:
+        raise ValueError(
+            f"Unknown id_format {params['id_format']} for column {column}, expected one of {ID_FORMATS}"
+        )
+
+
+class TransformationStep:
+    """One compiled rule: the column operation to run when the column is present,
+    and the one to run when a required column is missing. Both mutate the
+    DataFrame and return a Series of per-row errors (or None).
+    """
+
+    def __init__(self, column, operation, required, apply_present, apply_missing):
+        self.column = column
+        self.operation = operation
+        self.required = required
+        self.apply_present = apply_present
+        self.apply_missing = apply_missing
+        self.seconds = 0.0
+        self.rows = 0
+
+    def apply(self, df):
+        if self.column in df.columns:
+            func = self.apply_present
+        elif self.required:
+            func = self.apply_missing
+        else:
+            return None
+        if func is None:
+            return None
+
+        start = time.perf_counter()
+        errors = func(df)
+        self.seconds += time.perf_counter() - start
+        self.rows += len(df)
+        return errors
+
+
+class TransformationPlan:
+    """Compiled transformation rules, reused for every chunk and file a
+    Transformer processes. Keeps a running time per step.
+    """
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+    # Time spent in each step since the plan was built (or last reset)
+    def timings(self):
+        return pd.DataFrame(
+            [
+                {
+                    "column": step.column,
+                    "operation": step.operation,
+                    "seconds": step.seconds,
+                    "rows": step.rows,
+                    "rows_per_second": step.rows / step.seconds if step.seconds else None,
+                }
+                for step in self.steps
+            ],
+            columns=["column", "operation", "seconds", "rows", "rows_per_second"],
+        )
+
+    def reset_timings(self):
+        for step in self.steps:
+            step.seconds = 0.0
+            step.rows = 0
+
+
+class RuleErrors:
+    """Rule failures in a chunk, counted per operation and column with the
+    first few distinct failing values, so a chunk with many bad cells is
+    reported in one log record instead of one per cell.
+    """
+
+    def __init__(self, max_samples=ERROR_SAMPLES):
+        self.max_samples = max_samples
+        # (operation, column) -> number of failed rows, and {value: message} samples
+        self.counts = {}
+        self.samples = {}
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    # One failed cell (value may be None when the column is missing)
+    def add(self, operation, column, value, message):
+        key = (operation, column)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        samples = self.samples.setdefault(key, {})
+        value = None if pd.isna(value) else value
+        if len(samples) < self.max_samples and value not in samples:
+            samples[value] = message
+
+    # A column of per-row errors (NA where valid) and the values that failed
+    def add_column(self, operation, column, errors, values=None):
+        failed = errors.notna()
+        count = int(failed.sum())
+        if not count:
+            return
+        key = (operation, column)
+        self.counts[key] = self.counts.get(key, 0) + count
+        samples = self.samples.setdefault(key, {})
+        if len(samples) < self.max_samples:
+            failed_values = values[failed] if values is not None else pd.Series(None, index=errors.index[failed])
+            first = failed_values.drop_duplicates().head(self.max_samples - len(samples))
+            for index, value in first.items():
+                samples.setdefault(None if pd.isna(value) else value, errors[index])
+
+    # One line per operation and column: the count and the sample values
+    def summary(self):
+        lines = []
+        for (operation, column), count in self.counts.items():
+            line = f"{count} rows failed {operation} on column {column}"
+            samples = self.samples.get((operation, column))
+            if samples:
+                line += ", e.g. " + "; ".join(
+                    f"{value!r}: {message}" for value, message in samples.items()
+                )
+            lines.append(line)
+        return lines
+
+    # Log the summary as one record and start counting again
+    def log(self, logger, context=""):
+        if self.counts:
+            logger.error(f"{len(self)} rule failures{context}:\n  " + "\n  ".join(self.summary()))
+        self.clear()
+
+    def clear(self):
+        self.counts = {}
+        self.samples = {}
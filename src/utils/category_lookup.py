@@ -0,0 +1,97 @@
+import os
+import pandas as pd
+from ..config.config import CATEGORY_CONFIG_FILE, VENDOR_MATCH_THRESHOLD
+from ..utils.file_util import load_from_json
+from ..utils.logger import logger
+from ..utils.vendor_matcher import VendorMatcher
+
+
+class CategoryLookup:
+    """Vendor -> category lookup backed by the category config file.
+
+    The file is parsed once and kept in memory (known vendors as a dict, the
+    category list as a frozenset). It is reloaded only when its mtime or size
+    changes, so vendors saved by manual_processor.save_known_vendors are
+    picked up by the next lookup. Vendors that aren't known exactly and have
+    no valid category of their own are matched against the known vendors with
+    a VendorMatcher.
+    """
+
+    def __init__(self, file_name, category_types=("expense", "income", "other"), match_threshold=VENDOR_MATCH_THRESHOLD):
+        self.file_name = file_name
+        self.category_types = category_types
+        self.match_threshold = match_threshold
+        self._file_key = None
+        self._known_vendors = {}
+        self._categories = frozenset()
+        self._matcher = VendorMatcher({}, match_threshold)
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.file_name)
+            file_key = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            file_key = "missing"
+        if file_key == self._file_key:
+            return
+
+        if file_key == "missing":
+            logger.error("No category found at {}".format(self.file_name))
+            self._known_vendors = {}
+            self._categories = frozenset()
+            self._matcher = VendorMatcher({}, self.match_threshold)
+            self._file_key = file_key
+            return
+
+        config = load_from_json(self.file_name)
+        categories = config.get("list", {})
+        self._known_vendors = dict(config.get("known_vendors", {}))
+        self._categories = frozenset(
+            category
+            for type in self.category_types
+            for category in categories.get(type, [])
+        )
+        self._matcher = VendorMatcher(self._known_vendors, self.match_threshold)
+        self._file_key = file_key
+
+    @property
+    def known_vendors(self):
+        self._refresh()
+        return self._known_vendors
+
+    @property
+    def categories(self):
+        self._refresh()
+        return self._categories
+
+    def invalidate(self):
+        self._file_key = None
+
+    # Look up a single vendor exactly, then fall back to the given category if
+    # it is valid, and only then match the vendor against the known vendors
+    def lookup(self, vendor, category=None):
+        known_vendors = self.known_vendors
+        if vendor in known_vendors:
+            return known_vendors[vendor]
+        if category and category in self._categories:
+            return category
+        if not pd.isna(vendor):
+            return self._matcher.match(vendor)
+        return None
+
+    # Look up a whole batch of vendors with one Series.map, then keep the valid
+    # given categories; the distinct vendors still unknown are matched in one
+    # batch. Returns the assigned categories (NA where nothing is known).
+    def lookup_column(self, vendors, categories=None):
+        known_vendors = self.known_vendors
+        result = vendors.map(known_vendors).astype(object)
+        if categories is not None:
+            valid_category = categories.isin(self._categories)
+            result = result.where(result.notna() | ~valid_category, categories)
+        unknown = result.isna() & vendors.notna()
+        if unknown.any():
+            matches = self._matcher.match_many(vendors[unknown].unique())
+            result[unknown] = vendors[unknown].map(matches)
+        return result.where(result.notna(), pd.NA)
+
+category_lookup = CategoryLookup(CATEGORY_CONFIG_FILE)
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from ..config.config import CONFIG_CACHE_DIR
+from ..utils.file_util import load_from_json, load_from_yaml
+
+
+class ConfigRegistry:
+    """Parsed config files (rules and schema mappings), shared by everything in
+    the process.
+
+    Each file is parsed on first use and kept in memory until its mtime or size
+    changes. The parsed form is also pickled to cache_dir, so other processes
+    (pool workers, the next CLI run) skip parsing the YAML/JSON again. The
+    returned objects are shared: treat them as read-only.
+    """
+
+    def __init__(self, cache_dir=CONFIG_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def load(self, file_name):
+        path = os.path.abspath(file_name)
+        stat = os.stat(path)
+        file_key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == file_key:
+                return entry[1]
+            data = self._read_cache(path, file_key)
+            if data is None:
+                data = self._parse(path)
+                self._write_cache(path, file_key, data)
+            self._entries[path] = (file_key, data)
+            return data
+
+    def invalidate(self):
+        self._entries.clear()
+
+    def _parse(self, path):
+        if path.endswith((".yaml", ".yml")):
+            return load_from_yaml(path)
+        if path.endswith(".json"):
+            return load_from_json(path)
+        raise ValueError(f"Unknown config file type: {path}")
+
+    def _cache_file(self, path):
+        digest = hashlib.sha1(path.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{os.path.basename(path)}.{digest}.pickle")
+
+    # Parsed data cached for this version of the file, or None
+    def _read_cache(self, path, file_key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_file(path), "rb") as file:
+                cached_path, cached_key, data = pickle.load(file)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return None
+        if cached_path != path or cached_key != file_key:
+            return None
+        return data
+
+    # The cache is best effort: a read-only or full disk only costs a re-parse
+    def _write_cache(self, path, file_key, data):
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    pickle.dump((path, file_key, data), file, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_name, self._cache_file(path))
+            except BaseException:
+                os.remove(temp_name)
+                raise
+        except OSError:
+            pass
+
+
+config_registry = ConfigRegistry()
@@ -1,6 +1,8 @@
 import os
 import hashlib
 import json
+import numpy as np
+import tempfile
 import yaml
 from ..config.config import CATEGORY_CONFIG_FILE
 import pandas as pd
@@ -30,16 +32,207 @@ def hash_row(row, hash_columns):
     return hashlib.md5(row_data.encode()).hexdigest()
 
 
+# Transaction id formats produced by hash_rows
+ID_FORMATS = ["md5", "hash64"]
+# Fixed 16-byte SipHash key, so hash64 ids do not change between runs
+HASH64_KEY = "0123456789123456"
+
+
+# String form of each value, with nulls as "nan". Only the unique values are
+# converted, so repeated dates and vendors cost one str() each.
+def _value_strings(values):
+    codes, uniques = pd.factorize(values)
+    strings = np.array([str(v) for v in uniques] + ["nan"], dtype=object)
+    return strings, codes
+
+
+# Each value of a column as str() writes the value hash_row gets from
+# df.apply(axis=1): an all-numeric frame hands rows over in its common dtype
+# (ints become floats next to a float column); otherwise every value keeps its
+# own type, so nulls are "nan", "None", "<NA>" or "NaT".
+def _row_value_strings(values, frame_dtype):
+    if frame_dtype != object:
+        values = pd.Series(values.to_numpy(dtype=frame_dtype), index=values.index)
+    strings, codes = _value_strings(values)
+    strings = strings[codes]
+    nulls = codes == -1
+    if nulls.any() and frame_dtype == object:
+        # One str() per kind of null
+        names = {}
+        strings[nulls] = [
+            names.setdefault(type(v), str(v)) for v in values.to_numpy(dtype=object)[nulls]
+        ]
+    return strings
+
+
+# Hash whole columns at once into one id per row. Every value is hashed by its
+# string form. hash_columns defaults to all columns.
+#   md5:    32 hex chars, MD5 of the concatenated values, the same ids as
+#           hash_row on each row of df (nulls as str() writes them)
+#   hash64: 16 hex chars, the 64-bit SipHash of each value combined across
+#           columns in order, i.e. pandas hash_pandas_object(index=False) with
+#           HASH64_KEY on the string values, with nulls as "nan"
+def hash_rows(df, hash_columns=None, id_format="md5"):
+    if id_format not in ID_FORMATS:
+        raise ValueError(f"Unknown id format {id_format}, expected one of {ID_FORMATS}")
+    columns = list(hash_columns) if hash_columns else list(df.columns)
+    # Dtype of the rows hash_row would get from df.apply(axis=1)
+    frame_dtype = df.iloc[:0].to_numpy().dtype
+    if frame_dtype != object and not set(columns) <= set(df.columns):
+        # Missing columns make each row take a dtype that holds NaN (ints become floats)
+        frame_dtype = pd.Series([], dtype=frame_dtype).reindex([0]).dtype
+    df = df.reindex(columns=columns)
+
+    if id_format == "md5":
+        row_data = np.full(len(df), "", dtype=object)
+        for col in columns:
+            row_data = row_data + _row_value_strings(df[col], frame_dtype)
+        ids = [hashlib.md5(r.encode()).hexdigest() for r in row_data]
+        return pd.Series(ids, index=df.index, dtype=object)
+
+    # Same combination as pandas' combine_hash_arrays (CPython's tuple hash)
+    hashes = np.full(len(df), 0x345678, dtype=np.uint64)
+    mult = np.uint64(1000003)
+    for i, col in enumerate(columns):
+        strings, codes = _value_strings(df[col])
+        value_hashes = pd.util.hash_array(strings, encoding="utf8", hash_key=HASH64_KEY, categorize=False)
+        hashes ^= value_hashes[codes]
+        hashes *= mult
+        mult += np.uint64(82520 + 2 * (len(columns) - i))
+    hashes += np.uint64(97531)
+
+    # Big-endian bytes to hex, then split into one 16-char string per row
+    hex_ids = np.frombuffer(hashes.astype(">u8").tobytes().hex().encode(), dtype="S16")
+    return pd.Series(hex_ids.astype(str), index=df.index, dtype=object)
+
+
 def find_duplicate_rows(df, column):
     return df[df.duplicated(subset=[column], keep=False)]
 
 def extract_csv_data(file_name):
     return pd.read_csv(file_name)
 
+# Write a CSV to a temp file in the same directory and rename it into place, so
+# a crash never leaves a partially written file behind
+def write_csv_atomic(df, file_name):
+    write_csv_chunks_atomic([df], file_name)
+
+# Like write_csv_atomic, for DataFrames produced one chunk at a time (the header
+# comes from the first chunk). Returns the number of rows written.
+def write_csv_chunks_atomic(chunks, file_name):
+    dir_name = os.path.dirname(file_name) or "."
+    os.makedirs(dir_name, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=dir_name, suffix=".tmp")
+    rows = 0
+    try:
+        with os.fdopen(fd, "w", newline="") as file:
+            for i, df in enumerate(chunks):
+                df.to_csv(file, index=False, header=i == 0)
+                rows += len(df)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_name, file_name)
+    except BaseException:
+        os.remove(temp_name)
+        raise
+    return rows
+
+# Offset just past the last newline in file (0 if there is none), reading
+# backwards in blocks from size
+def _last_line_end(file, size, block_size=65536):
+    end = size
+    while end > 0:
+        start = max(0, end - block_size)
+        file.seek(start)
+        newline = file.read(end - start).rfind(b"\n")
+        if newline != -1:
+            return start + newline + 1
+        end = start
+    return 0
+
+# Size of file_name recorded in its append marker before an append that never
+# finished, or None. The marker is written (and synced) before the rows, so a
+# file longer than the recorded size holds the start of a torn append.
+def _committed_size(marker_name):
+    try:
+        with open(marker_name) as marker:
+            return int(marker.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+# Append rows to a CSV in O(new rows). The header is only written when the file
+# is created; on append the columns must match the existing header and are
+# written in its order. A failed append is truncated back to the original size.
+# While rows are being written the size before the append is kept in a
+# "<file_name>.append" marker, so a torn append left by a hard kill is dropped
+# by the next append. A last row that is only missing its newline (e.g. from an
+# external edit) is kept.
+def append_to_csv(df, file_name):
+    if df.empty:
+        return
+    if not os.path.exists(file_name):
+        write_csv_atomic(df, file_name)
+        return
+
+    columns = list(pd.read_csv(file_name, nrows=0).columns)
+    if sorted(columns) != sorted(df.columns):
+        raise ValueError(
+            f"Columns {list(df.columns)} do not match {file_name} columns {columns}"
+        )
+    data = df[columns].to_csv(index=False, header=False).encode()
+    marker_name = file_name + ".append"
+
+    with open(file_name, "r+b") as file:
+        size = file.seek(0, os.SEEK_END)
+        committed_size = _committed_size(marker_name)
+        if committed_size is not None and committed_size < size:
+            logger.warning(f"Dropping {size - committed_size} bytes of an unfinished append from {file_name}.")
+            file.truncate(committed_size)
+            size = committed_size
+        elif size:
+            line_start = _last_line_end(file, size)
+            if line_start < size:
+                file.seek(line_start)
+                last_line = pd.read_csv(file, header=None, dtype=str, keep_default_na=False)
+                if last_line.shape != (1, len(columns)):
+                    raise ValueError(
+                        f"Last line of {file_name} is not a row of {len(columns)} columns, fix it before appending"
+                    )
+                data = b"\n" + data
+        file.seek(size)
+
+        with open(marker_name, "w") as marker:
+            marker.write(str(size))
+            marker.flush()
+            os.fsync(marker.fileno())
+        try:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        except BaseException:
+            file.truncate(size)
+            raise
+    os.remove(marker_name)
+
 def load_from_json(file_name):
     with open(file_name, "r") as file:
         return json.load(file)
     
+# Write JSON to a temp file and rename it into place
+def save_to_json(data, file_name):
+    dir_name = os.path.dirname(file_name) or "."
+    os.makedirs(dir_name, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=dir_name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_name, file_name)
+    except BaseException:
+        os.remove(temp_name)
+        raise
+
 def load_from_yaml(file_name):
     with open(file_name, "r") as file:
         return yaml.safe_load(file)
@@ -0,0 +1,92 @@
+import os
+import sqlite3
+from ..config.config import ID_INDEX_FILE
+from ..storage.transaction_store import read_store_fingerprint, write_store_fingerprint
+from ..utils.logger import logger
+
+
+class TransactionIdIndex:
+    """Persistent index of the transaction ids already in the final store.
+
+    Ids are kept in a SQLite table with the id as primary key, so checking a
+    batch costs O(batch) lookups instead of re-reading the final file. The
+    connection is opened on first use. The index is (re)built from the ids in
+    the final store when it doesn't exist yet or was last updated for another
+    store, or another state of the store (see read_store_fingerprint).
+    """
+
+    QUERY_BATCH_SIZE = 500
+
+    def __init__(self, index_file=ID_INDEX_FILE, final_store=None):
+        self.index_file = index_file
+        self.final_store = final_store
+        self._connection = None
+
+    @property
+    def store(self):
+        if self.final_store is None:
+            from ..storage.transaction_store import get_final_store
+
+            self.final_store = get_final_store()
+        return self.final_store
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.index_file) or ".", exist_ok=True)
+            # Not tied to the opening thread: the review writes from a worker thread
+            self._connection = sqlite3.connect(self.index_file, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS transaction_ids (id TEXT PRIMARY KEY) WITHOUT ROWID"
+            )
+            if read_store_fingerprint(self._connection) != self.store.fingerprint():
+                self.rebuild()
+        return self._connection
+
+    # Rebuild the index from the ids in the final store
+    def rebuild(self):
+        ids = self.store.read(columns=["id"])["id"]
+        connection = self.connection
+        with connection:
+            connection.execute("DELETE FROM transaction_ids")
+            connection.executemany(
+                "INSERT OR IGNORE INTO transaction_ids (id) VALUES (?)",
+                ((str(id),) for id in ids.dropna()),
+            )
+        write_store_fingerprint(connection, self.store.fingerprint())
+        logger.info(f"Built transaction id index from {len(ids)} transactions in the final store.")
+
+    # Return a boolean Series marking which ids are already indexed
+    def contains(self, ids):
+        values = [str(id) for id in ids.dropna().unique()]
+        known = set()
+        for start in range(0, len(values), self.QUERY_BATCH_SIZE):
+            batch = values[start:start + self.QUERY_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            known.update(
+                row[0]
+                for row in self.connection.execute(
+                    f"SELECT id FROM transaction_ids WHERE id IN ({placeholders})", batch
+                )
+            )
+        return ids.astype(str).isin(known) & ids.notna()
+
+    # Index ids just appended to the final store
+    def add(self, ids):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO transaction_ids (id) VALUES (?)",
+                ((str(id),) for id in ids.dropna()),
+            )
+        write_store_fingerprint(self.connection, self.store.fingerprint())
+
+    # Split a batch into rows with new ids and duplicates (already indexed or
+    # repeated within the batch)
+    def split_new(self, df, column="id"):
+        duplicate = self.contains(df[column]) | df[column].duplicated(keep="first")
+        return df[~duplicate], df[duplicate]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -1,30 +1,90 @@
+import atexit
 import logging
 import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from ..config.config import LOG_FILE, LOG_FILE_LEVEL, LOG_LEVEL
+
+
+class LazyFileHandler(logging.FileHandler):
+    """FileHandler that creates its directory and opens the file on the first
+    record instead of at import, so importing the package has no side effects."""
+
+    def __init__(self, file_name, **kwargs):
+        super().__init__(file_name, delay=True, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+class BackgroundHandler(QueueHandler):
+    """Queues records for a QueueListener thread that writes them to the
+    console and file handlers, so logging never waits on I/O. The listener is
+    started by the first record and stopped (flushed) at exit. Processes forked
+    from this one (pool workers) exit without running atexit, so they don't
+    start a listener and write directly.
+    """
+
+    def __init__(self, *handlers):
+        super().__init__(queue.SimpleQueue())
+        self.handlers = handlers
+        self.listener = None
+        self._owner_pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self.listener is None:
+                self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+                self.listener.start()
+                atexit.register(self.stop)
+
+    # Write the queued records and stop the listener thread
+    def stop(self):
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+    def emit(self, record):
+        if os.getpid() != self._owner_pid:
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            return
+        if self.listener is None:
+            self._start()
+        super().emit(record)
+
+
+# Set the console verbosity (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+def set_log_level(level):
+    console_handler.setLevel(level)
+    logger.setLevel(min(console_handler.level, file_handler.level))
+
 
 # Create a logger
 logger = logging.getLogger(__name__)
 
-# Set the logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-logger.setLevel(logging.DEBUG)
-
 # Create handlers
 # Console handler
 console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.DEBUG)
+console_handler.setLevel(LOG_LEVEL)
 
-# File handler
-base_dir = os.path.abspath(
-    "/Users/josephheflin/Desktop/dev/personal-finance/data_processing_project/"
-)
-log_file = os.path.join(base_dir, "logs/", "app.log")
-file_handler = logging.FileHandler(log_file)
-file_handler.setLevel(logging.INFO)
+# File handler (LOG_FILE, opened when the first record is written)
+file_handler = LazyFileHandler(LOG_FILE)
+file_handler.setLevel(LOG_FILE_LEVEL)
 
 # Create a formatter and add it to the handlers
 formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 console_handler.setFormatter(formatter)
 file_handler.setFormatter(formatter)
 
-# Add the handlers to the logger
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
+# Records below both handlers' levels are dropped before they are queued
+logger.setLevel(min(console_handler.level, file_handler.level))
+
+# Add the handlers to the logger, through the background queue
+background_handler = BackgroundHandler(console_handler, file_handler)
+logger.addHandler(background_handler)
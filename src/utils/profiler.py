@@ -0,0 +1,119 @@
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+
+class RunProfiler:
+    """Records wall time, rows/sec and peak memory per stage of an ETL run.
+
+    Stages are timed with ``with profiler.stage(name, rows):`` and may nest
+    (e.g. one stage per transformation rule inside "apply_transformation").
+    Peak memory is traced with tracemalloc, so it only covers allocations
+    made while the profiler is enabled, and slows the run down; pass
+    trace_memory=False for timings only. A disabled profiler does nothing.
+    """
+
+    def __init__(self, name=None, enabled=True, trace_memory=True):
+        self.name = name
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.started_at = None
+        self.seconds = 0.0
+        self._peaks = []
+        self._started_tracing = False
+
+    def start(self):
+        if not self.enabled:
+            return
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._start_time = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        if not self.enabled or self.started_at is None:
+            return
+        self.seconds += time.perf_counter() - self._start_time
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def stage(self, name, rows=0):
+        if not self.enabled:
+            return nullcontext()
+        return self._stage(name, rows)
+
+    @contextmanager
+    def _stage(self, name, rows):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # Keep the enclosing stage's peak before resetting it for this stage
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+        self._peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1] if tracing else 0)
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            self._record(name, rows, seconds, peak)
+
+    def _record(self, name, rows, seconds, peak):
+        stage = self.stages.setdefault(
+            name, {"calls": 0, "rows": 0, "seconds": 0.0, "peak_memory_bytes": 0}
+        )
+        stage["calls"] += 1
+        stage["rows"] += rows
+        stage["seconds"] += seconds
+        stage["peak_memory_bytes"] = max(stage["peak_memory_bytes"], peak)
+
+    # Time each item produced by an iterable (e.g. chunks from a CSV reader)
+    def iterate(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            if self.enabled:
+                self.stages[name]["rows"] += len(item)
+            yield item
+
+    def report(self):
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "stages": [
+                dict(
+                    stage=name,
+                    rows_per_second=stage["rows"] / stage["seconds"] if stage["seconds"] else None,
+                    **stage,
+                )
+                for name, stage in self.stages.items()
+            ],
+        }
+
+    def write_report(self, report_dir):
+        os.makedirs(report_dir, exist_ok=True)
+        file_name = os.path.join(
+            report_dir,
+            f"{os.path.basename(self.name or 'run')}_{datetime.now():%Y%m%d_%H%M%S}.json",
+        )
+        with open(file_name, "w") as file:
+            json.dump(self.report(), file, indent=2)
+        return file_name
+
+
+NULL_PROFILER = RunProfiler(enabled=False)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+# In-memory types of the standardized transactions (docs/transaction_schema.md).
+# "cents" columns hold integer cents (Int64) and "date" columns datetime64; both
+# are formatted as strings only when written out (format_transactions).
+STANDARD_DTYPES = {
+    "id": "str",
+    "source": "category",
+    "type": "category",
+    "amount": "cents",
+    "vendor_long": "str",
+    "vendor_short": "str",
+    "date": "date",
+    "category": "category",
+    "balance": "cents",
+    "notes": "str",
+}
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+# Whole cents of numeric values (or numeric strings), rounded exactly like
+# "%.2f" formatting. Missing, invalid and infinite values become NA.
+def to_cents(values):
+    numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    scaled = numbers * 100
+    cents = np.rint(scaled)
+    # x * 100 can land on the wrong side of a half cent; format those few exactly
+    with np.errstate(invalid="ignore"):
+        near_half = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_half):
+        cents[i] = int(("%.2f" % numbers[i]).replace(".", ""))
+    result = pd.Series(cents, index=values.index).where(np.isfinite(cents))
+    return result.astype("Int64")
+
+
+# Cents as 0.00 strings (NA stays NA)
+def format_cents(cents):
+    result = pd.Series(pd.NA, index=cents.index, dtype=object)
+    valid = cents.notna()
+    if not valid.any():
+        return result
+    values = cents[valid].to_numpy(dtype="int64")
+    magnitude = np.abs(values)
+    dollars = (magnitude // 100).astype(str)
+    fraction = np.char.zfill((magnitude % 100).astype(str), 2)
+    text = np.char.add(np.char.add(np.where(values < 0, "-", ""), dollars), np.char.add(".", fraction))
+    result[valid] = text
+    return result
+
+
+# Convert columns to their types: "cents", "date" (parsed with date_formats,
+# default DATE_FORMAT) or a pandas dtype. Columns already holding cents or
+# datetimes are kept; formatted values ("12.50", "2023-10-22") are parsed.
+def apply_dtypes(df, dtypes, date_formats=None):
+    for column, dtype in dtypes.items():
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if dtype == "cents":
+            df[column] = values.astype("Int64") if pd.api.types.is_integer_dtype(values) else to_cents(values)
+        elif dtype == "date":
+            if not pd.api.types.is_datetime64_dtype(values):
+                date_format = (date_formats or {}).get(column, DATE_FORMAT)
+                df[column] = pd.to_datetime(values, format=date_format, errors="coerce").astype("datetime64[ns]")
+        else:
+            df[column] = values.astype(dtype)
+    return df
+
+
+# Copy of df with its cents and date columns formatted as strings for output.
+# Columns that are already strings are left as they are.
+def format_columns(df, dtypes, date_formats=None):
+    formatted = {}
+    for column, dtype in dtypes.items():
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if dtype == "cents" and pd.api.types.is_numeric_dtype(values):
+            cents = values if pd.api.types.is_integer_dtype(values) else to_cents(values)
+            formatted[column] = format_cents(cents)
+        elif dtype == "date" and pd.api.types.is_datetime64_dtype(values):
+            formatted[column] = values.dt.strftime((date_formats or {}).get(column, DATE_FORMAT))
+    return df.assign(**formatted) if formatted else df
+
+
+# Standardized transactions formatted for CSV files (amounts 0.00, dates YYYY-MM-DD)
+def format_transactions(df):
+    return format_columns(df, STANDARD_DTYPES)
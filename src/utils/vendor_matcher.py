@@ -0,0 +1,63 @@
+import re
+from collections import Counter, defaultdict
+
+
+# Normalize a card descriptor for matching: uppercase, drop digits and
+# punctuation (store numbers, "*", "#"), collapse whitespace.
+# e.g. "SQ *COFFEE 1234 SEATTLE" -> "SQ COFFEE SEATTLE"
+def normalize_vendor(vendor):
+    return " ".join(re.sub(r"[^A-Z]+", " ", str(vendor).upper()).split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class VendorMatcher:
+    """Matches vendor descriptors to known vendors' categories.
+
+    Known vendors are indexed by normalized descriptor; a vendor whose
+    normalized form isn't known is matched to the most similar known one by
+    character trigram (Jaccard) similarity, if it reaches the threshold.
+    Results are memoized, so a vendor is only matched once.
+    """
+
+    def __init__(self, known_vendors, threshold=0.75):
+        self.threshold = threshold
+        votes = defaultdict(Counter)
+        for vendor, category in known_vendors.items():
+            votes[normalize_vendor(vendor)][category] += 1
+        # Most common category when several known vendors normalize the same way
+        self.categories = {key: counter.most_common(1)[0][0] for key, counter in votes.items() if key}
+        self.keys = list(self.categories)
+        self.key_trigrams = [trigrams(key) for key in self.keys]
+        self.index = defaultdict(list)
+        for key_id, grams in enumerate(self.key_trigrams):
+            for gram in grams:
+                self.index[gram].append(key_id)
+        self._matches = {}
+
+    def match(self, vendor):
+        if vendor in self._matches:
+            return self._matches[vendor]
+
+        key = normalize_vendor(vendor)
+        category = self.categories.get(key)
+        if category is None and key and self.threshold is not None:
+            grams = trigrams(key)
+            shared = Counter(key_id for gram in grams for key_id in self.index.get(gram, ()))
+            best_score = 0
+            for key_id, count in shared.items():
+                score = count / (len(grams) + len(self.key_trigrams[key_id]) - count)
+                if score > best_score:
+                    best_score, category = score, self.categories[self.keys[key_id]]
+            if best_score < self.threshold:
+                category = None
+
+        self._matches[vendor] = category
+        return category
+
+    # Match a batch of vendors; returns {vendor: category or None}
+    def match_many(self, vendors):
+        return {vendor: self.match(vendor) for vendor in vendors}
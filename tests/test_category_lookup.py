@@ -0,0 +1,61 @@
+from data_processing_project.src.utils.category_lookup import CategoryLookup
+from data_processing_project.src.utils.vendor_matcher import normalize_vendor
+import json
+import os
+import pandas as pd
+
+
+def write_categories(path, known_vendors):
+    with open(path, "w") as file:
+        json.dump({"list": {"expense": ["Gas", "Groceries"]}, "known_vendors": known_vendors}, file)
+
+
+def test_lookup_column(tmp_path):
+    path = tmp_path / "categories.json"
+    write_categories(path, {"Shell": "Gas"})
+    lookup = CategoryLookup(str(path))
+
+    vendors = pd.Series(["Shell", "Corner Store", "Unknown"])
+    categories = pd.Series([None, "Groceries", "Nope"])
+    assert lookup.lookup_column(vendors, categories).tolist() == ["Gas", "Groceries", pd.NA]
+    assert lookup.categories == frozenset(["Gas", "Groceries"])
+
+
+def test_reloads_when_file_changes(tmp_path):
+    path = tmp_path / "categories.json"
+    write_categories(path, {"Shell": "Gas"})
+    lookup = CategoryLookup(str(path))
+    assert lookup.lookup("Corner Store") is None
+
+    write_categories(path, {"Shell": "Gas", "Corner Store": "Groceries"})
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert lookup.lookup("Corner Store") == "Groceries"
+
+
+def test_matches_normalized_and_similar_vendors(tmp_path):
+    path = tmp_path / "categories.json"
+    write_categories(path, {"SQ *COFFEE 1234 SEATTLE": "Restaurant", "SHELL OIL 5739": "Gas"})
+    lookup = CategoryLookup(str(path))
+
+    vendors = pd.Series(["SQ *COFFEE 5678 SEATTLE", "SHELL OIL 0042", "SQ *COFFEE 5678 SEATLE", "TRADER JOES #552", None])
+    assert lookup.lookup_column(vendors).tolist() == ["Restaurant", "Gas", "Restaurant", pd.NA, pd.NA]
+    assert lookup.lookup("SQ *COFFEE 9999 SEATTLE") == "Restaurant"
+    assert lookup.lookup("SHELL OIL 0042 DENVER") is None
+
+
+def test_valid_category_wins_over_similar_vendor(tmp_path):
+    path = tmp_path / "categories.json"
+    write_categories(path, {"SHELL OIL 5739": "Gas"})
+    lookup = CategoryLookup(str(path))
+
+    vendors = pd.Series(["SHELL OIL 0042", "SHELL OIL 0042"])
+    categories = pd.Series(["Groceries", "Nope"])
+    assert lookup.lookup_column(vendors, categories).tolist() == ["Groceries", "Gas"]
+    assert lookup.lookup("SHELL OIL 0042", "Groceries") == "Groceries"
+    assert lookup.lookup("SHELL OIL 0042", "Nope") == "Gas"
+
+
+def test_normalize_vendor():
+    assert normalize_vendor("SQ *COFFEE 1234 SEATTLE") == "SQ COFFEE SEATTLE"
+    assert normalize_vendor("  Shell#12 ") == "SHELL"
@@ -0,0 +1,133 @@
+from data_processing_project.src.transformation.common_transformation import Transformer
+from data_processing_project.src.transformation.transform_sources import CheckingTransformer, CreditCardATransformer
+from data_processing_project.src.utils.logger import BackgroundHandler
+import logging
+import pandas as pd
+import pytest
+import threading
+
+
+def sample_source_a():
+    return pd.DataFrame({
+        "Transaction Date": ["2023-10-22", "10/22/2023", "1/5/23", "22-10-2023", "bad", None],
+        "Transaction Description": ["Vendor description", "Other shop", "x" * 300, None, "Other shop", "Other shop"],
+        "Transaction Type": ["Debit", "Credit", "Weird", None, "Debit", "Credit"],
+        "Transaction Amount": [1.005, 2.675, -3.0, 12.5, None, 4.0],
+        "Balance": [100.0, None, -5.0, 1.0, 2.0, 3.0],
+    })
+
+
+def sample_source_b():
+    return pd.DataFrame({
+        "Transaction Date": ["2023-10-22", "10/22/2023", "bad"],
+        "Description": ["Vendor description", "Other shop", "Other shop"],
+        "Category": ["Food & Drink", "Shopping", "Nope"],
+        "Amount": [-1.005, -2.675, None],
+        "Balance": [100.0, None, 1.0],
+        "Type": ["Sale", "Payment", "Zap"],
+    })
+
+
+def as_comparable(df):
+    return df.astype(object).where(df.notna(), "<NULL>").astype(str)
+
+
+def test_columnar_matches_row_by_row():
+    for transformer_class, sample in [
+        (CheckingTransformer, sample_source_a),
+        (CreditCardATransformer, sample_source_b),
+    ]:
+        expected = transformer_class().transform_data(sample())
+        actual = transformer_class(columnar=True).transform_data(sample())
+        pd.testing.assert_frame_equal(as_comparable(actual), as_comparable(expected))
+
+
+def test_unknown_vendor_leaves_only_its_rows_uncategorized():
+    # sourceA has no category column; only "Vendor description" is a known vendor
+    for columnar in [False, True]:
+        transformer = CheckingTransformer(columnar=columnar)
+        df = transformer.transform_data(sample_source_a())
+        assert df["category"].isna().tolist() == [False, True, True, True, True, True]
+
+
+def test_columnar_reports_row_errors():
+    transformer = CheckingTransformer(columnar=True)
+    transformer.transform_data(sample_source_a())
+    errors = transformer.errors
+    assert errors["has_error"].tolist() == [False, True, True, True, True, True]
+    assert "Invalid date format for bad." in errors.loc[4, "error"]
+    assert "Invalid value: Weird" in errors.loc[2, "error"]
+
+
+def test_format_date_column_infers_format_and_falls_back():
+    transformer = CheckingTransformer(columnar=True)
+    values = pd.Series(["10/22/2023", "1/5/2023", "2023.10.22", "1/5/23", "bad", None])
+    assert transformer.infer_date_format(values) == "%m/%d/%Y"
+
+    result, errors = transformer.format_date_column(values, "%Y-%m-%d")
+    assert result.dt.strftime("%Y-%m-%d").tolist()[:4] == ["2023-10-22", "2023-01-05", "2023-10-22", "2023-01-05"]
+    assert errors.notna().tolist() == [False, False, False, False, True, True]
+
+
+def test_plan_validates_rules_and_records_timings():
+    transformer = CheckingTransformer(columnar=True)
+    transformer.transform_data(sample_source_a())
+    timings = transformer.plan.timings()
+    assert len(timings) == len(transformer.transform_rules["transformations"])
+    assert timings.loc[timings["operation"] == "format_date", "rows"].item() == 6
+
+    rules = {"transformations": [{"column": "amount", "operation": "round", "params": {"required": True}}]}
+    with pytest.raises(ValueError, match="Unknown operation round"):
+        Transformer("sourceA_example", rules, {"sourceA_example": {"Amount": "amount"}})
+
+    rules = {"transformations": [{"column": "amount", "operation": "truncate", "params": {"required": True}}]}
+    with pytest.raises(ValueError, match="max_length"):
+        Transformer("sourceA_example", rules, {"sourceA_example": {"Amount": "amount"}})
+
+    rules = {"transformations": [{"column": "id", "operation": "hash_row", "params": {"required": True, "id_format": "sha1"}}]}
+    with pytest.raises(ValueError, match="Unknown id_format sha1"):
+        Transformer("sourceA_example", rules, {"sourceA_example": {"Amount": "amount"}})
+
+
+def test_rule_failures_are_logged_as_one_summary_per_chunk(caplog):
+    for columnar in [False, True]:
+        caplog.clear()
+        transformer = CheckingTransformer(columnar=columnar)
+        with caplog.at_level(logging.ERROR):
+            transformer.transform_data(pd.concat([sample_source_a()] * 50, ignore_index=True))
+        assert len(caplog.records) == 1
+        summary = caplog.records[0].getMessage()
+        assert (
+            "100 rows failed format_date on column date, e.g. 'bad': Invalid date format for bad.; "
+            "None: Missing required date value." in summary
+        )
+        assert "failed validate_value on column type, e.g. 'Weird'" in summary
+        assert len(transformer.rule_errors) == 0
+
+
+def test_unmapped_types_are_counted_not_logged_per_row(caplog):
+    transformer = CreditCardATransformer()
+    with caplog.at_level(logging.DEBUG):
+        transformer.transform_data(pd.concat([sample_source_b()] * 50, ignore_index=True))
+    messages = [record.getMessage() for record in caplog.records]
+    assert not any("Zap" in message for message in messages if "rule failures" not in message)
+    assert any("50 rows failed validate_value on column type, e.g. 'Zap'" in message for message in messages)
+
+
+def test_background_handler_writes_records_on_listener_thread():
+    records = []
+
+    class ListHandler(logging.Handler):
+        def emit(self, record):
+            records.append((record.getMessage(), threading.current_thread()))
+
+    handler = BackgroundHandler(ListHandler(logging.INFO))
+    test_logger = logging.getLogger("test_background_handler")
+    test_logger.addHandler(handler)
+    test_logger.setLevel(logging.DEBUG)
+    test_logger.propagate = False
+    test_logger.info("one")
+    test_logger.debug("dropped by the handler level")
+    handler.stop()
+    assert [message for message, _ in records] == ["one"]
+    assert records[0][1] is not threading.current_thread()
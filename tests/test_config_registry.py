@@ -0,0 +1,30 @@
+from data_processing_project.src.utils.config_registry import ConfigRegistry
+import os
+
+
+def test_registry_parses_once_and_reloads_changed_files(tmp_path, monkeypatch):
+    rules_file = tmp_path / "rules.yaml"
+    rules_file.write_text("transformations:\n  - column: amount\n")
+    registry = ConfigRegistry(cache_dir=str(tmp_path / "cache"))
+
+    rules = registry.load(str(rules_file))
+    assert rules == {"transformations": [{"column": "amount"}]}
+    assert registry.load(str(rules_file)) is rules
+
+    rules_file.write_text("transformations:\n  - column: balance\n")
+    os.utime(rules_file, ns=(0, os.stat(rules_file).st_mtime_ns + 1_000_000))
+    assert registry.load(str(rules_file)) == {"transformations": [{"column": "balance"}]}
+
+
+def test_registry_reuses_parsed_files_from_disk_cache(tmp_path, monkeypatch):
+    mapping_file = tmp_path / "mapping.json"
+    mapping_file.write_text('{"sourceA": {"Amount": "amount"}}')
+    cache_dir = str(tmp_path / "cache")
+    ConfigRegistry(cache_dir=cache_dir).load(str(mapping_file))
+
+    # A new process (registry) reads the pickled form instead of parsing
+    def fail_parse(self, path):
+        raise AssertionError(f"parsed {path}")
+
+    monkeypatch.setattr(ConfigRegistry, "_parse", fail_parse)
+    assert ConfigRegistry(cache_dir=cache_dir).load(str(mapping_file)) == {"sourceA": {"Amount": "amount"}}
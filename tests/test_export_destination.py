@@ -0,0 +1,46 @@
+from data_processing_project.src.export.export_destination import export_destination, month_range
+from data_processing_project.src.storage.transaction_store import CsvTransactionStore, ParquetTransactionStore
+import pandas as pd
+import pytest
+
+
+def sample_transactions():
+    return pd.DataFrame({
+        "date": ["2023-09-30", "2023-10-01", "2023-10-31", "2023-11-01"],
+        "vendor_long": ["Old", "Cafe", "Shell", "New"],
+        "type": ["Debit"] * 4,
+        "amount": ["1.00", "12.50", "40.00", "8.25"],
+        "balance": ["100.00"] * 4,
+        "id": ["a", "b", "c", "d"],
+        "source": ["sourceA_example", "sourceA_example", "sourceB_example", "sourceA_example"],
+        "category": ["Other", "Restaurant", "Gas", "Other"],
+    })
+
+
+def stores(tmp_path):
+    yield CsvTransactionStore(str(tmp_path / "transactions.csv"), chunk_size=2)
+    pytest.importorskip("pyarrow")
+    yield ParquetTransactionStore(str(tmp_path / "transactions"))
+
+
+def test_export_filters_by_source_and_date_range(tmp_path):
+    start_date, end_date = month_range("2023-10")
+    assert (start_date, end_date) == ("2023-10-01", "2023-10-31")
+
+    for store in stores(tmp_path):
+        store.append(sample_transactions())
+        output_file = tmp_path / "export.csv"
+
+        rows = export_destination(
+            "destinationA_example", str(output_file), ["sourceA_example"], start_date, end_date, store=store
+        )
+        assert rows == 1
+        with open(output_file) as file:
+            assert file.read() == (
+                "Date (MM-DD-YYYY),Store / Vendor,$ Amount,Expense Category,Notes (Optional)\n"
+                "10-01-2023,Cafe,12.50,Restaurant,\n"
+            )
+
+        assert export_destination("destinationA_example", str(output_file), store=store) == 4
+        assert export_destination("destinationA_example", str(output_file), start_date="2024-01-01", store=store) == 0
+        assert list(pd.read_csv(output_file).columns)[0] == "Date (MM-DD-YYYY)"
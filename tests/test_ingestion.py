@@ -0,0 +1,79 @@
+from data_processing_project.src.ingestion.common_ingestion import SourceReader, parse_source_mapping
+from data_processing_project.src.ingestion.ingest_from_source_b import SourceBReader
+import os
+import pandas as pd
+import pytest
+
+SCHEMA_MAPPING = {
+    "source": {
+        "Date": {"column": "date", "dtype": "str"},
+        "Amount": {"column": "amount", "dtype": "numeric"},
+        "Description": {"column": "vendor_long", "dtype": "str"},
+    }
+}
+
+
+def write_input(path):
+    with open(path, "w") as file:
+        file.write("Amount,Ignored,Date,Description\n1,x,2023-10-01,Shop\n,y,2023-10-02,\n2.5,z,2023-10-03,\"Shop, Inc\"\n")
+
+
+def test_parse_source_mapping():
+    renames, dtypes = parse_source_mapping({"A": "amount", "B": {"column": "date", "dtype": "str"}})
+    assert renames == {"A": "amount", "B": "date"}
+    assert dtypes == {"B": "str"}
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_reader_loads_mapped_columns_with_dtypes(tmp_path, engine):
+    input_file = tmp_path / "input.csv"
+    write_input(input_file)
+    reader = SourceReader("source", SCHEMA_MAPPING, engine)
+
+    chunks = list(reader.read_chunks(input_file, 2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    df = pd.concat(chunks)
+    assert list(df.columns) == ["Amount", "Date", "Description"]
+    assert df["Amount"].dtype == "float64"
+    assert df["Amount"].isna().tolist() == [False, True, False]
+    assert df["Description"].tolist()[2] == "Shop, Inc"
+    assert pd.isna(df["Description"].tolist()[1])
+    assert list(df.index) == [0, 1, 2]
+
+    # Only the rows after the offset
+    with open(input_file, "rb") as file:
+        offset = len(file.readline()) + len(file.readline())
+    df = next(reader.read_chunks(input_file, None, offset))
+    assert df["Date"].tolist() == ["2023-10-02", "2023-10-03"]
+    chunks = reader.read_chunks(input_file, 2, os.path.getsize(input_file))
+    assert sum(len(chunk) for chunk in chunks) == 0
+
+    # Only the rows before the end, from the offset or the header
+    df = pd.concat(reader.read_chunks(input_file, 2, end=offset))
+    assert df["Date"].tolist() == ["2023-10-01"]
+    df = pd.concat(reader.read_chunks(input_file, 1, offset, os.path.getsize(input_file) - 1))
+    assert df["Date"].tolist() == ["2023-10-02", "2023-10-03"]
+
+
+def test_reader_picks_engine():
+    assert SourceBReader().engine == "pyarrow"
+    assert SourceReader("source", {"source": {"Amount": "amount"}}).engine == "c"
+    with pytest.raises(ValueError, match="No schema mapping"):
+        SourceReader("other", SCHEMA_MAPPING)
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_reader_infers_numbers_like_read_csv(tmp_path, engine):
+    input_file = tmp_path / "input.csv"
+    with open(input_file, "w") as file:
+        file.write("Amount,Date,Description\n1,2023-10-01,Shop\n2,2023-10-02,Shop\n2.5,2023-10-03,Shop\n")
+        file.write('"1,200.00",2023-10-04,Shop\n3,2023-10-05,Shop\n,2023-10-06,Shop\n')
+    reader = SourceReader("source", SCHEMA_MAPPING, engine)
+
+    # Per chunk: whole numbers stay int64 and invalid values keep the strings,
+    # exactly as pd.read_csv infers them (transaction ids hash these values)
+    chunks = list(reader.read_chunks(input_file, 2))
+    expected = list(pd.read_csv(input_file, chunksize=2))
+    assert [str(chunk["Amount"].dtype) for chunk in chunks] == ["int64", "str", "float64"]
+    for chunk, expected_chunk in zip(chunks, expected):
+        assert chunk["Amount"].astype(str).tolist() == expected_chunk["Amount"].astype(str).tolist()
@@ -0,0 +1,323 @@
+from data_processing_project.src import main
+from data_processing_project.src.transformation.transform_sources import CreditCardATransformer
+from data_processing_project.src.utils.id_index import TransactionIdIndex
+from data_processing_project.src.storage.rollups import SpendingRollups
+from data_processing_project.src.storage.transaction_store import CsvTransactionStore, SqliteTransactionStore
+from data_processing_project.src.utils.profiler import RunProfiler
+from data_processing_project.src.ingestion.ingestion_manifest import IngestionManifest
+import json
+import os
+import pandas as pd
+import pytest
+
+
+def write_sample_input(path, rows=10):
+    pd.DataFrame({
+        "Transaction Date": ["2023-10-%02d" % (i + 1) for i in range(rows)],
+        "Description": ["Vendor description" if i % 3 else "Other shop" for i in range(rows)],
+        "Category": ["Gas" if i % 2 else None for i in range(rows)],
+        "Amount": [-(i + 0.5) for i in range(rows)],
+        "Balance": [100.0] * rows,
+        "Type": ["Sale"] * rows,
+    }).to_csv(path, index=False)
+
+
+# Point main's outputs at files in tmp_path, suffixed with name
+def use_outputs(monkeypatch, tmp_path, name=""):
+    final_file = tmp_path / f"final{name}.csv"
+    pending_file = tmp_path / f"pending{name}.csv"
+    monkeypatch.setattr(main, "final_store", CsvTransactionStore(str(final_file)))
+    monkeypatch.setattr(main, "PENDING_FILE", str(pending_file))
+    monkeypatch.setattr(main, "id_index", TransactionIdIndex(str(tmp_path / f"ids{name}.sqlite"), CsvTransactionStore(str(final_file))))
+    monkeypatch.setattr(main, "manifest", IngestionManifest(str(tmp_path / f"manifest{name}.json")))
+    monkeypatch.setattr(main, "rollups", SpendingRollups(str(tmp_path / f"rollups{name}.sqlite"), CsvTransactionStore(str(final_file))))
+    return final_file, pending_file
+
+
+def test_process_source_file_in_chunks(tmp_path, monkeypatch):
+    input_file = tmp_path / "input.csv"
+    write_sample_input(input_file)
+    outputs = {}
+    for chunk_size in [None, 3]:
+        final_file, pending_file = use_outputs(monkeypatch, tmp_path, f"_{chunk_size}")
+        completed_ids = main.process_source_file(CreditCardATransformer(), input_file, chunk_size)
+        outputs[chunk_size] = (pd.read_csv(final_file), pd.read_csv(pending_file))
+        assert len(completed_ids) == len(outputs[chunk_size][0])
+
+    pd.testing.assert_frame_equal(outputs[3][0], outputs[None][0])
+    pd.testing.assert_frame_equal(outputs[3][1], outputs[None][1])
+    assert len(outputs[3][0]) + len(outputs[3][1]) == 10
+
+    # Rollups updated chunk by chunk match aggregating the final file
+    final = outputs[3][0]
+    rollups = main.rollups.read()
+    assert rollups["count"].sum() == len(final)
+    assert rollups["amount"].sum() == pytest.approx(final["amount"].sum())
+    assert rollups.groupby("category")["count"].sum().to_dict() == final.groupby("category").size().to_dict()
+
+
+def test_process_source_file_columnar_matches_row_by_row(tmp_path, monkeypatch):
+    input_file = tmp_path / "input.csv"
+    write_sample_input(input_file)
+    outputs = {}
+    for columnar in [False, True]:
+        final_file, pending_file = use_outputs(monkeypatch, tmp_path, f"_{columnar}")
+        transformer = main.get_transformer(CreditCardATransformer, columnar)
+        assert transformer.columnar is columnar
+        completed_ids = main.process_source_file(transformer, input_file, 4)
+        outputs[columnar] = (completed_ids, pd.read_csv(final_file), pd.read_csv(pending_file))
+
+    assert main.get_transformer(CreditCardATransformer).columnar is main.COLUMNAR
+    assert outputs[True][0].tolist() == outputs[False][0].tolist()
+    pd.testing.assert_frame_equal(outputs[True][1], outputs[False][1])
+    pd.testing.assert_frame_equal(outputs[True][2], outputs[False][2])
+
+
+def test_process_source_file_rejects_known_ids(tmp_path, monkeypatch):
+    input_file = tmp_path / "input.csv"
+    write_sample_input(input_file)
+    final_file, _ = use_outputs(monkeypatch, tmp_path)
+
+    first_ids = main.process_source_file(CreditCardATransformer(), input_file, 4)
+    monkeypatch.setattr(main, "manifest", IngestionManifest(str(tmp_path / "new_manifest.json")))
+    second_ids = main.process_source_file(CreditCardATransformer(), input_file, 4)
+    assert len(first_ids) > 0
+    assert len(second_ids) == 0
+    assert len(pd.read_csv(final_file)) == len(first_ids)
+
+    # A new index is built from the ids already in the final file
+    rebuilt_index = TransactionIdIndex(str(tmp_path / "rebuilt.sqlite"), CsvTransactionStore(str(final_file)))
+    assert rebuilt_index.contains(first_ids).all()
+
+
+def test_id_index_and_rollups_follow_their_store(tmp_path, monkeypatch):
+    input_file = tmp_path / "input.csv"
+    write_sample_input(input_file)
+    final_file, _ = use_outputs(monkeypatch, tmp_path)
+    first_ids = main.process_source_file(CreditCardATransformer(), input_file, 4)
+    assert len(first_ids) > 0
+
+    # Same index and rollup files, but another (empty) store: both are rebuilt
+    store = SqliteTransactionStore(str(tmp_path / "final.sqlite"))
+    id_index = TransactionIdIndex(str(tmp_path / "ids.sqlite"), store)
+    rollups = SpendingRollups(str(tmp_path / "rollups.sqlite"), store)
+    assert not id_index.contains(first_ids).any()
+    assert rollups.read().empty
+
+    # The CSV store reset behind the index's back
+    os.remove(final_file)
+    id_index = TransactionIdIndex(str(tmp_path / "ids.sqlite"), CsvTransactionStore(str(final_file)))
+    assert not id_index.contains(first_ids).any()
+
+    # Unchanged store: the index is reused as it is
+    monkeypatch.setattr(main, "manifest", IngestionManifest(str(tmp_path / "new_manifest.json")))
+    main.process_source_file(CreditCardATransformer(), input_file, 4)
+    id_index = TransactionIdIndex(str(tmp_path / "ids.sqlite"), CsvTransactionStore(str(final_file)))
+    monkeypatch.setattr(id_index, "rebuild", lambda: pytest.fail("index rebuilt"))
+    assert id_index.contains(first_ids).all()
+    assert main.rollups.read()["count"].sum() == len(first_ids)
+
+
+def test_process_source_file_reports_invalid_amounts_per_row(tmp_path, monkeypatch):
+    input_file = tmp_path / "input.csv"
+    write_sample_input(input_file)
+    text = input_file.read_text().splitlines()
+    # Second row's amount written with a thousands separator
+    fields = text[2].split(",")
+    fields[3] = '"-1,200.00"'
+    text[2] = ",".join(fields)
+    input_file.write_text("\n".join(text) + "\n")
+    final_file, pending_file = use_outputs(monkeypatch, tmp_path)
+
+    for columnar in [False, True]:
+        transformer = CreditCardATransformer(columnar=columnar)
+        assert transformer.reader.engine == "pyarrow"
+        completed_ids = main.process_source_file(transformer, input_file, 4)
+        monkeypatch.setattr(main, "manifest", IngestionManifest(str(tmp_path / f"manifest_{columnar}.json")))
+
+    final, pending = pd.read_csv(final_file), pd.read_csv(pending_file)
+    # Every row is read; only the bad amount is left for review
+    assert len(pd.concat([final, pending]).drop_duplicates("id")) == 10
+    assert pending["amount"].isna().sum() >= 1
+
+
+def test_process_source_file_into_sqlite_store(tmp_path, monkeypatch):
+    input_file = tmp_path / "input.csv"
+    write_sample_input(input_file)
+    final_file, _ = use_outputs(monkeypatch, tmp_path)
+    csv_ids = main.process_source_file(CreditCardATransformer(), input_file, 4)
+
+    store = SqliteTransactionStore(str(tmp_path / "final.sqlite"))
+    use_outputs(monkeypatch, tmp_path, "_sqlite")
+    monkeypatch.setattr(main, "final_store", store)
+    monkeypatch.setattr(main, "id_index", TransactionIdIndex(str(tmp_path / "ids_store.sqlite"), store))
+    sqlite_ids = main.process_source_file(CreditCardATransformer(), input_file, 4)
+
+    assert sqlite_ids.tolist() == csv_ids.tolist()
+    columns = ["id", "source", "amount", "date", "category", "balance"]
+    pd.testing.assert_frame_equal(store.read(columns), pd.read_csv(final_file)[columns])
+
+
+def test_process_source_files_parallel_matches_serial(tmp_path, monkeypatch):
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    write_sample_input(input_dir / "credit_card_b.csv", rows=7)
+    write_sample_input(input_dir / "credit_card_a.csv", rows=5)
+    (input_dir / "notes.txt").write_text("not an input file")
+
+    input_files = main.scan_input_dir(str(input_dir))
+    assert [os.path.basename(f) for f, _ in input_files] == ["credit_card_a.csv", "credit_card_b.csv"]
+
+    outputs = []
+    for parallel in [False, True]:
+        final_file, _ = use_outputs(monkeypatch, tmp_path, f"_{parallel}")
+        if parallel:
+            main.process_source_files_parallel(input_files, workers=2, chunk_size=3)
+        else:
+            for input_file, transformer_class in input_files:
+                main.process_source_file(transformer_class(), input_file, 3)
+        outputs.append(pd.read_csv(final_file))
+
+    pd.testing.assert_frame_equal(outputs[0], outputs[1])
+
+
+def test_transform_source_file_writes_one_file_per_chunk(tmp_path):
+    input_file = tmp_path / "input.csv"
+    write_sample_input(input_file)
+    chunk_dir = tmp_path / "chunks"
+    chunk_dir.mkdir()
+
+    chunk_files, _ = main.transform_source_file(CreditCardATransformer, str(input_file), str(chunk_dir), 3)
+    assert [os.path.basename(f) for f in chunk_files] == ["000000.pkl", "000001.pkl", "000002.pkl", "000003.pkl"]
+    chunks = [pd.read_pickle(f) for f in chunk_files]
+    assert [len(df) for df in chunks] == [3, 3, 3, 1]
+
+    expected = CreditCardATransformer(columnar=main.COLUMNAR).transform_data(pd.read_csv(input_file))
+    assert pd.concat(chunks)["id"].tolist() == expected["id"].tolist()
+
+
+def test_process_source_file_profiled(tmp_path, monkeypatch):
+    input_file = tmp_path / "input.csv"
+    write_sample_input(input_file)
+    use_outputs(monkeypatch, tmp_path)
+
+    profiler = RunProfiler(str(input_file))
+    profiler.start()
+    main.process_source_file(CreditCardATransformer(columnar=True), input_file, 4, profiler=profiler)
+    profiler.stop()
+
+    with open(profiler.write_report(str(tmp_path / "profiles"))) as file:
+        report = json.load(file)
+    stages = {stage["stage"]: stage for stage in report["stages"]}
+    assert stages["read_csv"]["rows"] == 10
+    assert stages["apply_transformation"]["calls"] == 3
+    assert stages["rule date: format_date"]["rows"] == 10
+    assert stages["apply_transformation"]["peak_memory_bytes"] >= stages["rule date: format_date"]["peak_memory_bytes"] > 0
+
+
+def test_process_source_file_reads_only_new_rows(tmp_path, monkeypatch):
+    input_file = tmp_path / "input.csv"
+    write_sample_input(input_file, rows=6)
+    final_file, pending_file = use_outputs(monkeypatch, tmp_path)
+    main.process_source_file(CreditCardATransformer(), input_file, 4)
+
+    # Unchanged file is skipped
+    assert main.manifest.check(str(input_file)).skip
+    main.process_source_file(CreditCardATransformer(), input_file, 4)
+
+    # Only the rows appended since the last run are read
+    write_sample_input(tmp_path / "all.csv", rows=10)
+    with open(tmp_path / "all.csv") as file:
+        lines = file.readlines()
+    with open(input_file, "a") as file:
+        file.writelines(lines[7:])
+    main.process_source_file(CreditCardATransformer(), input_file, 4)
+
+    assert len(pd.read_csv(final_file)) + len(pd.read_csv(pending_file)) == 10
+    assert main.manifest.entries[os.path.abspath(input_file)]["rows"] == 10
+
+
+def test_process_source_file_reads_only_checked_rows(tmp_path, monkeypatch):
+    input_file = tmp_path / "input.csv"
+    write_sample_input(tmp_path / "all.csv", rows=10)
+    with open(tmp_path / "all.csv") as file:
+        lines = file.readlines()
+    with open(input_file, "w") as file:
+        file.writelines(lines[:5])
+    final_file, pending_file = use_outputs(monkeypatch, tmp_path)
+
+    # The export grows between the manifest check and the read
+    check = main.manifest.check
+
+    def check_then_grow(file_name):
+        plan = check(file_name)
+        with open(input_file, "a") as file:
+            file.writelines(lines[5:8])
+        return plan
+
+    monkeypatch.setattr(main.manifest, "check", check_then_grow)
+    main.process_source_file(CreditCardATransformer(), input_file, 4)
+    assert len(pd.read_csv(final_file)) + len(pd.read_csv(pending_file)) == 4
+
+    monkeypatch.setattr(main.manifest, "check", check)
+    main.process_source_file(CreditCardATransformer(), input_file, 4)
+    assert len(pd.read_csv(final_file)) + len(pd.read_csv(pending_file)) == 7
+    assert main.manifest.entries[os.path.abspath(input_file)]["rows"] == 7
+
+
+def test_manifest_reads_again_when_last_row_was_continued(tmp_path):
+    input_file = tmp_path / "input.csv"
+    input_file.write_text("a,b\n1,2")
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    manifest.record(str(input_file), manifest.check(str(input_file)), 1)
+
+    # A last row without its newline, then new rows: read from the offset
+    input_file.write_text("a,b\n1,2\r\n3,4\n")
+    plan = manifest.check(str(input_file))
+    assert (plan.skip, plan.offset, plan.rows) == (False, 7, 1)
+
+    # The last processed row itself was continued: read the file again
+    input_file.write_text("a,b\n1,23\n")
+    plan = manifest.check(str(input_file))
+    assert (plan.skip, plan.offset, plan.rows) == (False, 0, 0)
+
+
+def test_input_watcher_processes_and_archives_new_files(tmp_path, monkeypatch):
+    input_dir, archive_dir = tmp_path / "input", tmp_path / "archive"
+    input_dir.mkdir()
+    final_file, _ = use_outputs(monkeypatch, tmp_path)
+    watcher = main.InputWatcher(str(input_dir), str(archive_dir), poll_interval=0, settle_time=0, chunk_size=4)
+    watcher.run_once()
+    assert watcher.counters["queue_depth"] == 0
+
+    write_sample_input(input_dir / "credit_card_october.csv")
+    (input_dir / "unknown_bank.csv").write_text("a,b\n1,2\n")
+    assert watcher.poll() == 1
+    assert watcher.counters["queue_depth"] == 1
+    watcher.run(max_polls=2)
+
+    assert sorted(os.listdir(input_dir)) == ["unknown_bank.csv"]
+    assert os.listdir(archive_dir) == ["credit_card_october.csv"]
+    counters = watcher.counters
+    assert counters["files_processed"] == 1
+    assert counters["transactions_added"] == len(pd.read_csv(final_file)) > 0
+    assert counters["queue_depth"] == 0 and counters["last_lag"] >= 0
+
+    # The transformer stays warm for the next file of the same source
+    transformer = main.get_transformer(CreditCardATransformer)
+    write_sample_input(input_dir / "credit_card_november.csv", rows=3)
+    watcher.run_once()
+    assert main.get_transformer(CreditCardATransformer) is transformer
+    assert watcher.counters["files_processed"] == 2
+
+
+def test_archive_input_file_keeps_archived_files(tmp_path):
+    input_dir, archive_dir = tmp_path / "input", tmp_path / "archive"
+    input_dir.mkdir()
+    for version in ["first", "second", "third"]:
+        (input_dir / "checking.csv").write_text(version)
+        main.archive_input_file("checking.csv", str(input_dir), str(archive_dir))
+
+    assert os.listdir(input_dir) == []
+    archived = {name: (archive_dir / name).read_text() for name in os.listdir(archive_dir)}
+    assert archived == {"checking.csv": "first", "checking_1.csv": "second", "checking_2.csv": "third"}
@@ -0,0 +1,201 @@
+from data_processing_project.src.manual_processing import manual_processor
+from data_processing_project.src.storage.rollups import SpendingRollups
+from data_processing_project.src.storage.transaction_store import CsvTransactionStore, SqliteTransactionStore
+from data_processing_project.src.utils.id_index import TransactionIdIndex
+import json
+import pandas as pd
+import pytest
+import threading
+import time
+
+
+def pending_transactions():
+    return pd.DataFrame({
+        "id": ["a", "b", "c", "d"],
+        "vendor_long": ["SQ *COFFEE", "SQ *COFFEE", "SHELL", "SQ *COFFEE"],
+        "amount": ["1.00", "2.00", "3.00", "4.00"],
+        "category": [None, None, None, None],
+    })
+
+
+def use_files(monkeypatch, tmp_path):
+    category_file = tmp_path / "categories.json"
+    category_file.write_text(json.dumps({"list": {"expense": ["Gas", "Restaurant"]}, "known_vendors": {}}))
+    final_file = tmp_path / "final.csv"
+    pending_file = tmp_path / "pending.csv"
+    monkeypatch.setattr(manual_processor, "CATEGORY_CONFIG_FILE", str(category_file))
+    monkeypatch.setattr("data_processing_project.src.utils.file_util.CATEGORY_CONFIG_FILE", str(category_file))
+    monkeypatch.setattr(manual_processor, "categories", ["Gas", "Restaurant"])
+    monkeypatch.setattr(manual_processor, "PENDING_FILE", str(pending_file))
+    monkeypatch.setattr(manual_processor, "final_store", CsvTransactionStore(str(final_file)))
+    monkeypatch.setattr(manual_processor, "id_index", TransactionIdIndex(str(tmp_path / "ids.sqlite"), CsvTransactionStore(str(final_file))))
+    monkeypatch.setattr(manual_processor, "rollups", SpendingRollups(str(tmp_path / "rollups.sqlite"), CsvTransactionStore(str(final_file))))
+    return category_file, final_file, pending_file
+
+
+def test_category_answer_applies_to_all_vendor_rows(tmp_path, monkeypatch):
+    category_file, final_file, pending_file = use_files(monkeypatch, tmp_path)
+    answers = iter(["2", "1"])
+    prompts = []
+
+    def fake_input(prompt=""):
+        prompts.append(prompt)
+        return next(answers)
+
+    monkeypatch.setattr("builtins.input", fake_input)
+    manual_processor.process_pending_transactions(pending_transactions())
+
+    # One prompt for SQ *COFFEE (three rows) and one for SHELL
+    assert len(prompts) == 2
+    final = pd.read_csv(final_file)
+    assert dict(zip(final["id"], final["category"])) == {"a": "Restaurant", "b": "Restaurant", "c": "Gas", "d": "Restaurant"}
+    assert pd.read_csv(pending_file).empty
+    assert json.loads(category_file.read_text())["known_vendors"] == {"SQ *COFFEE": "Restaurant", "SHELL": "Gas"}
+
+
+def test_review_of_pending_file_read_from_csv(tmp_path, monkeypatch):
+    _, final_file, pending_file = use_files(monkeypatch, tmp_path)
+    pending = pending_transactions()
+    pending.loc[2, "amount"] = None
+    pending.to_csv(pending_file, index=False)
+    answers = iter(["2", "3.50", "1"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+
+    # Read as written (all-NaN float64 category, float64 amount) and as strings
+    assert pd.read_csv(pending_file)["category"].dtype == "float64"
+    manual_processor.process_pending_transactions(pd.read_csv(pending_file))
+    final = pd.read_csv(final_file, dtype=str)
+    assert dict(zip(final["id"], final["category"])) == {"a": "Restaurant", "b": "Restaurant", "c": "Gas", "d": "Restaurant"}
+    assert final.set_index("id").loc["c", "amount"] == "3.50"
+
+    (tmp_path / "strings").mkdir()
+    _, final_file, pending_file = use_files(monkeypatch, tmp_path / "strings")
+    pending.to_csv(pending_file, index=False)
+    answers = iter(["2", "3.50", "1"])
+    manual_processor.process_pending_transactions(manual_processor.read_pending_file(str(pending_file)))
+    final = pd.read_csv(final_file, dtype=str)
+    assert final["amount"].tolist() == ["1.00", "2.00", "3.50", "4.00"]
+
+
+def test_failed_review_still_saves_answers(tmp_path, monkeypatch):
+    _, final_file, pending_file = use_files(monkeypatch, tmp_path)
+    answers = iter(["2"])
+
+    def fake_input(prompt=""):
+        try:
+            return next(answers)
+        except StopIteration:
+            raise RuntimeError("console gone")
+
+    monkeypatch.setattr("builtins.input", fake_input)
+    with pytest.raises(RuntimeError, match="console gone"):
+        manual_processor.process_pending_transactions(pending_transactions())
+
+    assert pd.read_csv(final_file)["id"].tolist() == ["a", "b", "d"]
+    assert pd.read_csv(pending_file)["id"].tolist() == ["c"]
+
+
+def test_interrupted_review_keeps_unanswered_rows(tmp_path, monkeypatch):
+    _, final_file, pending_file = use_files(monkeypatch, tmp_path)
+    answers = iter(["2"])
+
+    def fake_input(prompt=""):
+        try:
+            return next(answers)
+        except StopIteration:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr("builtins.input", fake_input)
+    manual_processor.process_pending_transactions(pending_transactions())
+
+    assert pd.read_csv(final_file)["id"].tolist() == ["a", "b", "d"]
+    assert pd.read_csv(pending_file)["id"].tolist() == ["c"]
+
+
+def test_review_by_vendor_asks_largest_groups_first(tmp_path, monkeypatch):
+    _, final_file, pending_file = use_files(monkeypatch, tmp_path)
+    prompts = []
+    answers = iter(["2", "1"])
+
+    def fake_input(prompt=""):
+        prompts.append(prompt)
+        return next(answers)
+
+    monkeypatch.setattr("builtins.input", fake_input)
+    df = pending_transactions()
+    df.loc[2, "amount"] = "100.00"
+    assert manual_processor.vendor_groups(df).index.tolist() == ["SQ *COFFEE", "SHELL"]
+    assert manual_processor.vendor_groups(df, "total_amount").index.tolist() == ["SHELL", "SQ *COFFEE"]
+
+    manual_processor.process_pending_transactions(df, group_by_vendor=True)
+    assert len(prompts) == 2
+    final = pd.read_csv(final_file)
+    assert dict(zip(final["id"], final["category"])) == {"a": "Restaurant", "b": "Restaurant", "c": "Gas", "d": "Restaurant"}
+
+
+def test_prompt_timeout_ends_review(tmp_path, monkeypatch):
+    _, final_file, pending_file = use_files(monkeypatch, tmp_path)
+    monkeypatch.setattr(manual_processor, "TIMEOUT", 0.2)
+    answers = iter(["2"])
+
+    def fake_input(prompt=""):
+        try:
+            return next(answers)
+        except StopIteration:
+            time.sleep(1)  # Reviewer walked away
+            return "1"
+
+    monkeypatch.setattr("builtins.input", fake_input)
+    manual_processor.process_pending_transactions(pending_transactions())
+
+    assert pd.read_csv(final_file)["id"].tolist() == ["a", "b", "d"]
+    assert pd.read_csv(pending_file)["id"].tolist() == ["c"]
+
+
+def test_checkpoints_are_written_in_background(tmp_path, monkeypatch):
+    use_files(monkeypatch, tmp_path)
+    monkeypatch.setattr(manual_processor, "CHECKPOINT_EVERY", 1)
+    events = []
+    write_checkpoint = manual_processor.write_checkpoint
+
+    def slow_write_checkpoint(checkpoint):
+        time.sleep(0.2)
+        events.append(("write", list(checkpoint.completed["id"]), threading.current_thread() is threading.main_thread()))
+        write_checkpoint(checkpoint)
+
+    def fake_input(prompt=""):
+        events.append(("prompt",))
+        return "2"
+
+    monkeypatch.setattr(manual_processor, "write_checkpoint", slow_write_checkpoint)
+    monkeypatch.setattr("builtins.input", fake_input)
+    manual_processor.process_pending_transactions(pending_transactions())
+
+    # The second prompt didn't wait for the first checkpoint to be written
+    assert events[:2] == [("prompt",), ("prompt",)]
+    assert [e for e in events if e[0] == "write"] == [
+        ("write", ["a", "b", "d"], False),
+        ("write", ["c"], False),
+        ("write", [], False),
+    ]
+
+
+def test_review_recategorizes_vendor_history_and_rollups(tmp_path, monkeypatch):
+    use_files(monkeypatch, tmp_path)
+    store = SqliteTransactionStore(str(tmp_path / "final.sqlite"))
+    rollups = SpendingRollups(str(tmp_path / "store_rollups.sqlite"), store)
+    monkeypatch.setattr(manual_processor, "final_store", store)
+    monkeypatch.setattr(manual_processor, "id_index", TransactionIdIndex(str(tmp_path / "store_ids.sqlite"), store))
+    monkeypatch.setattr(manual_processor, "rollups", rollups)
+    columns = {"date": "2023-10-01", "source": "sourceA_example", "type": "Debit"}
+    history = pd.DataFrame({"id": ["old"], "vendor_long": ["SQ *COFFEE"], "amount": ["5.00"], "category": ["Gas"]})
+    store.append(history.assign(**columns))
+    rollups.rebuild()
+
+    answers = iter(["2", "1"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    manual_processor.process_pending_transactions(pending_transactions().assign(**columns))
+
+    assert store.read(columns=["category"], filters={"id": "old"})["category"].tolist() == ["Restaurant"]
+    assert rollups.read()[["category", "amount", "count"]].values.tolist() == [["Gas", 3.0, 1], ["Restaurant", 12.0, 4]]
+    pd.testing.assert_frame_equal(rollups.read(), (rollups.rebuild(), rollups.read())[1])
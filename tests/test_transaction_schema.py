@@ -0,0 +1,42 @@
+from data_processing_project.src.transformation.transform_sources import CheckingTransformer
+from data_processing_project.src.utils.transaction_schema import (
+    apply_dtypes,
+    format_cents,
+    format_transactions,
+    to_cents,
+)
+import numpy as np
+import pandas as pd
+
+
+def test_cents_round_trip_matches_two_decimal_formatting():
+    values = pd.Series([1.005, 2.675, -3.0, 0.125, -0.5, 12345.678, 0.0, None, np.inf])
+    cents = to_cents(values)
+    assert str(cents.dtype) == "Int64"
+    expected = ["%.2f" % value if np.isfinite(value) else None for value in values.fillna(np.nan)]
+    formatted = format_cents(cents)
+    assert formatted.where(formatted.notna(), None).tolist() == expected
+    assert format_cents(to_cents(pd.Series([None], dtype=float))).isna().all()
+
+
+def test_transform_data_returns_typed_columns():
+    df = pd.DataFrame({
+        "Transaction Date": ["2023-10-22", "10/22/2023"],
+        "Transaction Description": ["Vendor description", "Other shop"],
+        "Transaction Type": ["Debit", "Credit"],
+        "Transaction Amount": [1.005, 2.5],
+        "Balance": [100.0, 7.25],
+    })
+    result = CheckingTransformer(columnar=True).transform_data(df)
+    assert str(result["amount"].dtype) == "Int64"
+    assert result["amount"].tolist() == [100, 250]
+    assert pd.api.types.is_datetime64_dtype(result["date"])
+    assert isinstance(result["source"].dtype, pd.CategoricalDtype)
+
+    formatted = format_transactions(result)
+    assert formatted["amount"].tolist() == ["1.00", "2.50"]
+    assert formatted["date"].tolist() == ["2023-10-22", "2023-10-22"]
+    # Formatted values parse back to the same types
+    reparsed = apply_dtypes(formatted.copy(), {"amount": "cents", "date": "date"})
+    assert reparsed["amount"].tolist() == [100, 250]
+    assert reparsed["date"].equals(result["date"])
@@ -0,0 +1,87 @@
+from data_processing_project.src.storage.transaction_store import (
+    CsvTransactionStore,
+    ParquetTransactionStore,
+    SqliteTransactionStore,
+)
+import pandas as pd
+import pytest
+
+
+def sample_transactions():
+    return pd.DataFrame({
+        "date": ["2023-10-01", "2023-10-15", "2023-11-02"],
+        "vendor_long": ["Cafe", "Shell", "Cafe"],
+        "type": ["Debit", "Debit", "Debit"],
+        "amount": ["12.50", "40.00", "8.25"],
+        "balance": ["100.00", "60.00", "51.75"],
+        "id": ["a", "b", "c"],
+        "source": ["sourceA_example", "sourceA_example", "sourceB_example"],
+        "category": ["Restaurant", "Gas", "Restaurant"],
+    })
+
+
+def stores(tmp_path):
+    yield CsvTransactionStore(str(tmp_path / "transactions.csv"))
+    yield SqliteTransactionStore(str(tmp_path / "transactions.sqlite"))
+    pytest.importorskip("pyarrow")
+    yield ParquetTransactionStore(str(tmp_path / "transactions"))
+
+
+def test_append_and_read(tmp_path):
+    for store in stores(tmp_path):
+        df = sample_transactions()
+        store.append(df.iloc[:2])
+        store.append(df.iloc[2:])
+
+        spend = store.read(
+            columns=["id", "amount"],
+            filters={"month": "2023-10", "category": "Restaurant"},
+        )
+        assert list(spend.columns) == ["id", "amount"]
+        assert spend["id"].tolist() == ["a"]
+        assert float(spend["amount"].iloc[0]) == 12.5
+        assert sorted(store.read()["id"]) == ["a", "b", "c"]
+
+
+def test_parquet_partitions_by_source_and_month(tmp_path):
+    pytest.importorskip("pyarrow")
+    store = ParquetTransactionStore(str(tmp_path / "transactions"))
+    store.append(sample_transactions())
+
+    partitions = sorted(
+        str(path.parent.relative_to(tmp_path / "transactions"))
+        for path in (tmp_path / "transactions").rglob("*.parquet")
+    )
+    assert partitions == [
+        "source=sourceA_example/month=2023-10",
+        "source=sourceB_example/month=2023-11",
+    ]
+    assert store.read(columns=["amount"])["amount"].dtype == "float64"
+
+    # Stored as integer cents, with the types of STANDARD_DTYPES
+    import pyarrow.dataset as ds
+
+    schema = ds.dataset(str(tmp_path / "transactions"), format="parquet", partitioning="hive").schema
+    assert str(schema.field("amount").type) == "int64"
+    assert str(schema.field("balance").type) == "int64"
+    assert str(schema.field("date").type) == "date32[day]"
+    assert store.read(columns=["balance"])["balance"].tolist() == [100.0, 60.0, 51.75]
+
+
+def test_sqlite_upserts_by_id_and_recategorizes_vendors(tmp_path):
+    store = SqliteTransactionStore(str(tmp_path / "transactions.sqlite"))
+    df = sample_transactions()
+    store.append(df)
+    df.loc[0, "amount"] = "13.00"
+    store.append(df.iloc[:1])
+
+    stored = store.read(columns=["id", "amount", "date"])
+    assert stored["id"].tolist() == ["a", "b", "c"]
+    assert stored["amount"].tolist() == [13.0, 40.0, 8.25]
+    assert store.read(columns=["id"], date_range=("2023-10-02", "2023-11-30"))["id"].tolist() == ["b", "c"]
+
+    assert store.set_vendor_category("Cafe", "Coffee") == 2
+    assert store.read(columns=["id"], filters={"category": "Coffee"})["id"].tolist() == ["a", "c"]
+
+    indexes = {row[1] for row in store.connection.execute("PRAGMA index_list(transactions)")}
+    assert {"transactions_date", "transactions_source", "transactions_vendor_long", "transactions_category"} <= indexes